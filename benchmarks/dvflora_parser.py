@@ -0,0 +1,133 @@
+# Benchmarks the DVFlora nfprod-list.w row parser: the previous extract_products against the current one.
+# Both must return identical rows for every page; throughput is reported in rows per second.
+# Run from the repo root: python -m benchmarks.dvflora_parser [--corpus DIR]
+# DIR holds nfprod-list.w pages saved as *.html; without it a corpus is generated from dvflora_urls.csv.
+
+import argparse
+import csv
+import random
+import re
+import time
+from pathlib import Path
+from selectolax.parser import HTMLParser
+from modules.scrape.dvflora import URLS_CSV, extract_products
+
+# the parser dvflora.py used before
+def extract_products_legacy(html, group, variety, color, url):
+    tree = HTMLParser(html)
+    tbody = tree.css_first("#PageText > form:nth-of-type(2) > table > tbody")
+    if not tbody:
+        return []
+
+    products = []
+    seen = set()
+
+    for row in tbody.css("tr"):
+        cells = row.css("td")
+        if len(cells) < 8:
+            continue
+
+        item_number = cells[1].text(strip=True)
+        if not item_number or item_number in seen:
+            continue
+        seen.add(item_number)
+
+        name_node = cells[2].css_first("a")
+        product_name = name_node.text(strip=True) if name_node else None
+
+        origin_text = cells[2].text()
+        origin = origin_text.split("Origin:")[-1].strip() if "Origin:" in origin_text else None
+        sold_as = cells[3].text(strip=True)
+
+        stock_img = cells[4].css_first("img")
+        in_stock = "yes" in stock_img.attrs.get("src", "").lower() if stock_img else False
+
+        unit_price = None
+        for td in cells:
+            text = td.text(strip=True)
+            match_qty_price = re.search(r"(\d+)\s*@\s*\$?(\d+\.\d+)", text)
+            match_price_only = re.search(r"\$?(\d+\.\d+)", text)
+            if match_qty_price:
+                unit_price = float(match_qty_price.group(2))
+                break
+            elif match_price_only:
+                unit_price = float(match_price_only.group(1))
+                break
+
+        if product_name and item_number:
+            products.append((
+                item_number, product_name, origin, sold_as, in_stock,
+                unit_price, group, variety, color, url
+            ))
+
+    return products
+
+# one product row in the nfprod-list.w list layout; some rows carry the quirks the parser has to survive
+def build_row(rng, item_number, variety, color):
+    name = f"{variety} {color} {rng.choice([40, 50, 60, 70])}cm"
+    if rng.random() < 0.05:
+        name += " 2.5 ft" # decimals in the name are picked up as the price by the in-order scan
+    name_cell = f'<a href="nfprod-detail.w?ProdKey={item_number}">{name}</a><br><font size="1">Origin: {rng.choice(["Ecuador", "Colombia", "Holland"])}</font>'
+    if rng.random() < 0.02:
+        name_cell = name # no link, row is skipped
+    stock = rng.choice(["yes", "yes", "no"])
+    qty, price = rng.choice([10, 25, 50]), rng.uniform(0.3, 4)
+    price_cell = f"{qty} @ ${price:.2f}" if rng.random() < 0.8 else f"${price * qty:.2f}"
+    return (
+        f'<tr><td><input type="checkbox" name="sel" value="{item_number}"></td><td>{item_number}</td><td>{name_cell}</td>'
+        f'<td>{rng.choice(["Bunch", "Box", "Stem"])}</td><td><img src="/images/stock-{stock}.gif"></td>'
+        f'<td align="right">{price_cell}</td><td><input type="text" size="3" name="qty{item_number}"></td>'
+        f'<td><input type="image" src="/images/add.gif"></td></tr>'
+    )
+
+def build_corpus(pages, seed=0):
+    rng = random.Random(seed)
+    with open(URLS_CSV, newline="") as f:
+        rows = list(csv.DictReader(f))[:pages]
+    corpus = []
+    for row in rows:
+        items = [f"{rng.randrange(10**7, 10**8):08d}" for _ in range(50)]
+        items += rng.sample(items, 3) # duplicated rows across the page boundary
+        body = "".join(build_row(rng, item, row["variety"], row["color"]) for item in items)
+        body += '<tr><td colspan="8">Prices subject to change</td></tr>'
+        html = (
+            '<html><head><title>DV Flora</title></head><body><table><tr><td id="PageText">'
+            '<form name="search"><table><tbody><tr><td>Search</td><td><input name="q"></td></tr></tbody></table></form>'
+            f'<form name="prodlist"><table><tbody>{body}</tbody></table></form>'
+            '</td></tr></table></body></html>'
+        )
+        corpus.append((html, row["product_group"], row["variety"], row["color"], row["url"]))
+    return corpus
+
+def load_corpus(directory):
+    return [(path.read_text(encoding="utf-8", errors="replace"), "", "", "", path.name) for path in sorted(Path(directory).glob("*.html"))]
+
+def bench(parser, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = sum(len(parser(*page)) for page in corpus)
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory of saved nfprod-list.w pages (*.html)")
+    parser.add_argument("--pages", type=int, default=500, help="pages to generate without --corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(args.pages)
+    for page in corpus:
+        assert extract_products(*page) == extract_products_legacy(*page), f"parsers disagree on {page[4]}"
+
+    legacy_time, rows = bench(extract_products_legacy, corpus, args.repeat)
+    new_time, _ = bench(extract_products, corpus, args.repeat)
+    print(f"{len(corpus)} pages, {rows} rows, output identical")
+    print(f"{'parser':>8} {'rows/s':>10}")
+    print(f"{'legacy':>8} {rows / legacy_time:>10.0f}")
+    print(f"{'current':>8} {rows / new_time:>10.0f}")
+    print(f"speedup: {legacy_time / new_time:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Times the export path against the local SQLite sink, no cloud needed.
+#   legacy: pd.read_csv on the latest CSV, then 1000-row chunked appends (what pandas_gbq.to_gbq did), one competitor after the other
+#   sink:   the typed Parquet snapshot written by SQLiteSink, all competitors at once through export_all (full mode,
+#           the same rows the legacy path writes; export state goes to the scratch directory, not output/)
+# Run from the repo root: python -m benchmarks.export_sink [--scale 1 20]
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+import pandas as pd
+import pyarrow.parquet as pq
+from export import delta, export_to_bq
+from export.export_to_bq import COMPETITORS, export_all
+from export.sinks import SQLiteSink
+from modules.latest_eta_date import get_latest_eta_date
+from modules.store import parquet_path, save_to_parquet
+
+def legacy_export(csv_paths, db_path):
+    conn = sqlite3.connect(db_path)
+    for competitor, csv_path in csv_paths.items():
+        data = pd.read_csv(csv_path)
+        data.to_sql(competitor, conn, if_exists="append", index=False, chunksize=1000)
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 20])
+    args = parser.parse_args()
+
+    print(f"{'scale':>6} {'rows':>9} {'legacy s':>9} {'sink s':>8} {'speedup':>8}")
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as directory:
+            csv_paths = {}
+            rows = 0
+            for competitor in COMPETITORS:
+                latest_path = get_latest_eta_date(competitor)
+                data = pd.concat([pd.read_csv(latest_path)] * scale, ignore_index=True)
+                csv_paths[competitor] = os.path.join(directory, latest_path.name)
+                data.to_csv(csv_paths[competitor], index=False)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    save_to_parquet(data, competitor, "bench", output_root=directory, record=False)
+                rows += len(data)
+
+            start = time.perf_counter()
+            legacy_export(csv_paths, os.path.join(directory, "legacy.db"))
+            legacy_time = time.perf_counter() - start
+
+            # point the exporter at the scratch snapshots
+            export_to_bq.latest_snapshot = lambda competitor: ("bench", pq.read_table(parquet_path(competitor, "bench", directory)))
+            delta.STATE_DB = os.path.join(directory, "export_state.db")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(export_all(sink=SQLiteSink(os.path.join(directory, "sink.db")), mode="full"))
+            sink_time = time.perf_counter() - start
+            print(f"{scale:>6} {rows:>9} {legacy_time:>9.3f} {sink_time:>8.3f} {legacy_time / sink_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
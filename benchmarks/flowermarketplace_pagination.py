@@ -0,0 +1,112 @@
+# Benchmarks the Flowermarketplace page loop against a local stand-in for admin-ajax.php.
+# Compares the old one-page-at-a-time loop (with its fixed sleep) against fetch_pages_windowed.
+# Run from the repo root: python -m benchmarks.flowermarketplace_pagination
+
+import argparse
+import asyncio
+import csv
+import time
+import httpx
+from aiohttp import web
+from modules.pagination import fetch_pages_windowed
+from modules.scrape import flowermarketplace
+
+SAMPLE_CSV = "output/flowermarketplace/backup.csv" # raw rows as returned by wpf_product_listings
+ETA_DATE = "2025-04-29"
+
+def load_catalog(rows):
+    with open(SAMPLE_CSV, newline="") as f:
+        sample = list(csv.DictReader(f))
+    catalog = []
+    while len(catalog) < rows:
+        for row in sample[: rows - len(catalog)]:
+            catalog.append({
+                "id": int(row["id"]) + len(catalog),
+                "name": row["name"],
+                "landed_price": row["landed_price"],
+                "catslug": row["catslug"],
+                "date_text": "04/29/2025",
+                "source": row["source"],
+                "unit": row["unit"],
+            })
+    return catalog
+
+# serves `catalog` in pages of `page_size` rows, every response delayed by `latency` seconds
+async def start_server(catalog, page_size, latency):
+    async def listings(request):
+        await asyncio.sleep(latency)
+        page = int(request.query.get("page_no", 1))
+        start = (page - 1) * page_size
+        return web.json_response({"products": catalog[start:start + page_size]})
+
+    app = web.Application()
+    app.router.add_get("/wp-admin/admin-ajax.php", listings)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/wp-admin/admin-ajax.php"
+
+# the loop main() used before: one page awaited at a time plus a fixed sleep per page
+async def legacy_fetch(fetch, delay):
+    results = []
+    page = 1
+    while True:
+        products = await fetch(page)
+        await asyncio.sleep(delay)
+        if not products:
+            break
+        results.append(products)
+        page += 1
+    return results
+
+async def run_case(rows, args):
+    catalog = load_catalog(rows)
+    runner, url = await start_server(catalog, args.page_size, args.latency)
+    flowermarketplace.AJAX_URL = url
+    timings = {}
+    outputs = {}
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            async def fetch(page):
+                return await flowermarketplace.process_page(client, page, "products", ETA_DATE)
+
+            for name, run in (
+                ("legacy", lambda: legacy_fetch(fetch, args.legacy_delay)),
+                (f"windowed({args.window})", lambda: fetch_pages_windowed(fetch, window=args.window)),
+            ):
+                start = time.perf_counter()
+                pages = await run()
+                timings[name] = time.perf_counter() - start
+                outputs[name] = [p["id"] for page in pages for p in page]
+    finally:
+        await runner.cleanup()
+
+    legacy, windowed = outputs.values()
+    assert legacy == windowed, "windowed fetch returned different rows or order"
+    return timings, len(legacy)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1200)
+    parser.add_argument("--scale", type=int, default=10, help="second run uses rows * scale")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per response")
+    parser.add_argument("--legacy-delay", type=float, default=0.5, help="fixed sleep of the old loop")
+    parser.add_argument("--window", type=int, default=flowermarketplace.PREFETCH_WINDOW)
+    args = parser.parse_args()
+
+    results = []
+    for rows in (args.rows, args.rows * args.scale):
+        timings, count = asyncio.run(run_case(rows, args))
+        results.append((rows, count, timings))
+
+    print(f"\n{'rows':>8} {'variant':>14} {'seconds':>9} {'speedup':>8}")
+    for rows, count, timings in results:
+        baseline = timings["legacy"]
+        for name, seconds in timings.items():
+            print(f"{count:>8} {name:>14} {seconds:>9.2f} {baseline / seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
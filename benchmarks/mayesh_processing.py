@@ -0,0 +1,136 @@
+# Benchmarks Mayesh inventory processing: the previous per-product process_inventory_data against the columnar
+# process_inventory_frame. Both must produce the same CSV, byte for byte; time is reported per size.
+# Run from the repo root: python -m benchmarks.mayesh_processing [--sizes 1500 50000 500000]
+# The raw products are rebuilt from the newest output/mayesh CSV and repeated up to each size.
+
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import random
+import tempfile
+import time
+from datetime import datetime
+from modules.data import get_ibf_product_group, get_ibf_variety, process_inventory_frame
+from modules.store import save_to_csv
+
+def extract_stem_length(grade_name):
+    if not grade_name:
+        return None
+    import re
+    numbers = re.findall(r'\d+', str(grade_name))
+    return int(numbers[0]) if numbers else None
+
+# the per-product version data.py used before
+def process_inventory_data_legacy(products, date):
+    extracted_data = []
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    for product in products:
+        mayesh_category_id = product.get("category_id", 0)
+        ibf_product_group = get_ibf_product_group(mayesh_category_id)
+        mayesh_variety = product.get("product_id", 0)
+        ibf_variety = get_ibf_variety(mayesh_variety)
+
+        extracted_data.append({
+            "created_at": today,
+            "eta_date": date,
+            "state": "Kentucky",
+            "competitor": "Mayesh",
+            "grower_name": product.get("farm_name", "Unknown") if product.get("farm_name") else None,
+            "grower_country": product.get("country_name", None),
+            "competitor_product_id": product.get("product_id", 0),
+            "competitor_product_name": product["name"],
+            "competitor_product_group_name": product.get("category_name", None),
+            "competitor_product_group_id": product.get("category_id", 0),
+            "product_group_key": ibf_product_group,
+            "variety_key": ibf_variety,
+            "stem_length": extract_stem_length(product.get("grade_name")),
+            "color_name": product.get("color_name", None),
+            "competitor_product_url": f"https://www.mayesh.com/{product['seo_url']}",
+            "competitor_product_image": f"https://www.mayesh.com{product['image']}",
+            "available_units": product["qty"],
+            "stems_per_unit": product.get("unit_count", None),
+            "stem_price": float(product['price_per_stem']) if product.get("price_per_stem") else None,
+            "unit_price": float(product['price_per_unit']) if product.get("price_per_unit") else 0,
+            "base_price": product.get("main_landed_cost", 0),
+            "freight_price": product.get("freight", 0),
+            "margin": (1 - (1 / product["markup"])) * 100 if product.get("markup") else 0,
+            "competitor_highlight_name": product.get("highlight_name", None),
+        })
+
+    return extracted_data
+
+def optional(value, cast=str):
+    return cast(value) if value != "" else None
+
+# turns the rows of a saved inventory CSV back into products shaped like the inventory endpoint's JSON
+def snapshot_products():
+    path = sorted(glob.glob("output/mayesh/mayesh_inventory_*.csv"))[-1]
+    products = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            margin = float(row["margin"] or 0)
+            products.append({
+                "product_id": int(row["competitor_product_id"]),
+                "name": row["competitor_product_name"],
+                "farm_name": optional(row["grower_name"]),
+                "country_name": optional(row["grower_country"]),
+                "category_id": int(row["competitor_product_group_id"]),
+                "category_name": row["competitor_product_group_name"],
+                "grade_name": f"{int(float(row['stem_length']))} cm" if row["stem_length"] else None,
+                "color_name": optional(row["color_name"]),
+                "seo_url": row["competitor_product_url"].removeprefix("https://www.mayesh.com/"),
+                "image": row["competitor_product_image"].removeprefix("https://www.mayesh.com"),
+                "qty": int(row["available_units"]),
+                "unit_count": int(row["stems_per_unit"]),
+                "price_per_stem": f"{float(row['stem_price']):.2f}" if row["stem_price"] else None,
+                "price_per_unit": f"{float(row['unit_price']):.2f}" if row["unit_price"] else None,
+                "main_landed_cost": float(row["base_price"]),
+                "freight": float(row["freight_price"]),
+                "markup": round(1 / (1 - margin / 100), 4) if margin else None,
+                "highlight_name": optional(row["competitor_highlight_name"]),
+            })
+    return products
+
+def products_of_size(base, size):
+    rng = random.Random(size)
+    products = [dict(base[i % len(base)]) for i in range(size)]
+    for product in rng.sample(products, min(len(products), max(1, size // 50))):
+        product.pop(rng.choice(["farm_name", "grade_name", "markup", "main_landed_cost"]), None) # keys the API may leave out
+    return products
+
+def csv_text(rows, directory, name):
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = save_to_csv(rows, name, subdir="", output_root=directory)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1500, 50_000, 500_000])
+    args = parser.parse_args()
+
+    base = snapshot_products()
+    get_ibf_product_group(0) # load the mapping tables outside the timings
+    get_ibf_variety(0)
+
+    print(f"{'products':>9} {'legacy s':>9} {'columnar s':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            products = products_of_size(base, size)
+            legacy_time, legacy_rows = timed(process_inventory_data_legacy, products, "2025-04-30")
+            frame_time, frame = timed(process_inventory_frame, products, "2025-04-30")
+            if csv_text(legacy_rows, directory, "legacy.csv") != csv_text(frame, directory, "columnar.csv"):
+                raise SystemExit(f"❌ outputs differ at {size} products")
+            print(f"{size:>9} {legacy_time:>9.3f} {frame_time:>11.3f} {legacy_time / frame_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# The mapping scripts' name matcher: the old per-name loop (cos sim of one name against the whole catalog, iloc
+# lookups, list rebuilt on every IBF id takeover) vs utils/Mapping_products/matching.py, on synthetic embeddings.
+# Run from the repo root: python -m benchmarks.name_matching [--names 10000 --catalog 50000] [--legacy-sample 500]
+# Both run on the same data and must give identical matches; at full size the old loop is timed on a sample of
+# names and extrapolated (it needs minutes there).
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.Mapping_products.matching import match_products, normalized
+
+COLORS = ["Red", "White", "Pink", "Yellow", "Peach", "Lavender", "Burgundy", "Cream", "Assorted", "Bicolor", "Mixed"]
+FLOWERS = ["Rose", "Spray Rose", "Carnation", "Alstroemeria", "Hydrangea", "Lisianthus", "Chrysanthemum", "Tulip"]
+
+# the loop from mayesh_mapping.py, with numpy standing in for util.pytorch_cos_sim
+def legacy_match(query_df, query_names, query_embeddings, ibf_df, ibf_names, ibf_embeddings, threshold=0.8):
+    ibf_normalized = normalized(ibf_embeddings)
+    candidate_matches = []
+    for idx, query_name in enumerate(query_names):
+        query_id = query_df.iloc[idx]["competitor_product_id"]
+        similarities = ibf_normalized @ normalized(query_embeddings[idx:idx + 1])[0]
+        best_idx = similarities.argmax().item()
+        best_score = similarities[best_idx].item()
+        if "assorted" in query_name.lower():
+            ibf_name_lower = ibf_names[best_idx].lower()
+            specific_colors = ["red", "blue", "yellow", "green", "white", "pink", "purple", "orange",
+                               "peach", "lavender", "coral", "burgundy", "cream", "gold", "silver", "cream"]
+            has_color = any(color in ibf_name_lower for color in specific_colors)
+            if has_color and "assorted" not in ibf_name_lower:
+                best_score -= 0.05
+        if best_score >= threshold:
+            candidate_matches.append({
+                "mayesh_product_id": query_id,
+                "mayesh_product_name": query_name,
+                "ibf_product_id": ibf_df.iloc[best_idx]["variety_key"],
+                "ibf_product_name": ibf_names[best_idx],
+                "similarity_score": round(best_score, 3),
+            })
+    candidate_matches.sort(key=lambda x: x["similarity_score"], reverse=True)
+
+    ibf_to_mayesh_mapping = {}
+    final_matches = []
+    for match in candidate_matches:
+        ibf_id, name, score = match["ibf_product_id"], match["mayesh_product_name"], match["similarity_score"]
+        if ibf_id in ibf_to_mayesh_mapping:
+            if ibf_to_mayesh_mapping[ibf_id]["name"] == name:
+                final_matches.append(match)
+            elif score > ibf_to_mayesh_mapping[ibf_id]["score"] + 0.05:
+                final_matches = [m for m in final_matches if m["ibf_product_id"] != ibf_id]
+                final_matches.append(match)
+                ibf_to_mayesh_mapping[ibf_id] = {"name": name, "score": score}
+        else:
+            ibf_to_mayesh_mapping[ibf_id] = {"name": name, "score": score}
+            final_matches.append(match)
+    return pd.DataFrame(final_matches)
+
+# catalog of random vectors; every name sits next to a random catalog entry, some names repeat (box sizes)
+def synthetic(names, catalog, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    ibf_embeddings = rng.standard_normal((catalog, dim), dtype=np.float32)
+    ibf_names = [f"{FLOWERS[i % len(FLOWERS)]} {COLORS[(i // 8) % len(COLORS)]} {i}" for i in range(catalog)]
+    ibf_df = pd.DataFrame({"variety_key": [f"key-{i}" for i in range(catalog)], "ibf_product_name": ibf_names})
+
+    base = rng.integers(0, catalog, names)
+    source = np.where(rng.random(names) < 0.1, np.roll(np.arange(names), 1), np.arange(names)) # ~10% repeat a name
+    noise = rng.uniform(0.3, 1.2, (names, 1)).astype(np.float32)
+    query_embeddings = ibf_embeddings[base[source]] + noise[source] * rng.standard_normal((names, dim), dtype=np.float32)
+    query_names = [f"{FLOWERS[base[i] % len(FLOWERS)]} {COLORS[(i * 7) % len(COLORS)]} #{i}" for i in source]
+    query_df = pd.DataFrame({"competitor_product_id": np.arange(names) + 1000, "mayesh_product_name": query_names})
+    return query_df, query_names, query_embeddings, ibf_df, ibf_names, ibf_embeddings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=10000)
+    parser.add_argument("--catalog", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768) # bge-base-en-v1.5
+    parser.add_argument("--legacy-sample", type=int, default=500)
+    args = parser.parse_args()
+
+    data = synthetic(args.names, args.catalog, args.dim)
+    start = time.perf_counter()
+    matches = match_products(*data, prefix="mayesh", id_column="competitor_product_id")
+    batched_time = time.perf_counter() - start
+
+    sample = min(args.legacy_sample, args.names)
+    query_df, query_names, query_embeddings, *catalog = data
+    start = time.perf_counter()
+    legacy = legacy_match(query_df[:sample], query_names[:sample], query_embeddings[:sample], *catalog)
+    legacy_time = (time.perf_counter() - start) * args.names / sample
+    same = legacy.equals(match_products(query_df[:sample], query_names[:sample], query_embeddings[:sample], *catalog,
+                                        prefix="mayesh", id_column="competitor_product_id"))
+
+    print(f"{args.names} names x {args.catalog} catalog, {len(matches)} matches")
+    print(f"legacy loop: {legacy_time:8.2f} s{' (extrapolated from %d names)' % sample if sample < args.names else ''}")
+    print(f"batched:     {batched_time:8.2f} s  ({legacy_time / batched_time:.0f}x)")
+    print(f"identical matches on the first {sample} names: {same}")
+
+if __name__ == "__main__":
+    main()
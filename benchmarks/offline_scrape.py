@@ -0,0 +1,103 @@
+# Runs every scraper end to end against recorded responses and reports wall time, requests per second
+# and peak RSS. Record once against the live sites, then benchmark as often as needed:
+#   SCRAPE_MODE=record python main.py
+#   python -m benchmarks.offline_scrape [--latency 0.05] [--only dvflora petaljet]
+# Each scraper runs in its own process inside a scratch directory, so peak RSS is per scraper and
+# the CSVs / SQLite files it writes don't touch output/.
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRAPERS = ["mayesh", "flowermarketplace", "petaljet", "dvflora"]
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+async def run_scraper(name):
+    from modules.auth import authenticate
+    from modules.client import get_client
+    from modules.scrape.mayesh import fetch_available_dates
+
+    if name == "dvflora":
+        from modules.scrape import dvflora
+        await dvflora.scrape_all()
+        return
+
+    client = get_client()
+    headers = await authenticate(os.getenv("EMAIL"), os.getenv("PASSWORD"))
+    eta_date = await fetch_available_dates(client, headers) if headers else None
+    if not eta_date:
+        raise RuntimeError("no recorded Mayesh login / dates, record a run with SCRAPE_MODE=record first")
+    if name == "mayesh":
+        from main import run_mayesh
+        await run_mayesh(client, headers, eta_date)
+    elif name == "flowermarketplace":
+        from modules.scrape import flowermarketplace
+        await flowermarketplace.main(eta_date)
+    elif name == "petaljet":
+        from modules.scrape import petaljet
+        await petaljet.main(eta_date)
+
+# runs inside the scratch directory and prints its measurements as the last line of output
+def child(name):
+    from modules.replay import stats
+    start = time.perf_counter()
+    from modules.client import closing_clients
+    asyncio.run(closing_clients(run_scraper(name)))
+    wall = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"wall": wall, "requests": stats["requests"], "missing": stats["missing"], "peak_rss_mb": peak_rss_mb}))
+
+def scratch_dir():
+    workdir = Path(tempfile.mkdtemp(prefix="offline_scrape_"))
+    (workdir / "mapping").symlink_to(REPO_ROOT / "mapping")
+    (workdir / "utils" / "Mapping_products").mkdir(parents=True)
+    (workdir / "utils" / "Mapping_products" / "dvflora_urls.csv").symlink_to(REPO_ROOT / "utils" / "Mapping_products" / "dvflora_urls.csv")
+    for name in SCRAPERS:
+        (workdir / "output" / name).mkdir(parents=True)
+    return workdir
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="+", choices=SCRAPERS, default=SCRAPERS)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every replayed response")
+    parser.add_argument("--replay-dir", default=os.getenv("REPLAY_DIR", ".replay"))
+    parser.add_argument("--child", choices=SCRAPERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    env = dict(
+        os.environ,
+        SCRAPE_MODE="replay",
+        HTTP_CACHE="0",
+        REPLAY_LATENCY=str(args.latency),
+        REPLAY_DIR=str(Path(args.replay_dir).resolve()),
+        PYTHONPATH=str(REPO_ROOT),
+    )
+    results = {}
+    for name in args.only:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.offline_scrape", "--child", name],
+            cwd=scratch_dir(), env=env, capture_output=True, text=True,
+        )
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print(f"❌ {name} failed:\n{proc.stderr[-2000:]}")
+            continue
+        results[name] = json.loads(lines[-1])
+
+    print(f"\n{'scraper':>18} {'wall s':>8} {'requests':>9} {'req/s':>8} {'missing':>8} {'peak RSS MB':>12}")
+    for name, r in results.items():
+        print(f"{name:>18} {r['wall']:>8.2f} {r['requests']:>9} {r['requests'] / r['wall']:>8.1f} {r['missing']:>8} {r['peak_rss_mb']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Microbenchmark for the PetalJet collection-page parser: the old BeautifulSoup + DOTALL regex path
+# against extract_meta_products, which decodes `var meta` straight from the raw response.
+# Run from the repo root: python -m benchmarks.petaljet_parser [--fixtures DIR]
+# DIR holds collection pages saved as *.html; without it pages are built from the latest PetalJet snapshot.
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+import pandas as pd
+from bs4 import BeautifulSoup
+from modules.scrape.petaljet import extract_meta_products
+
+SNAPSHOT_CSV = "output/petaljet/petaljet_inventory_2025-04-29.csv"
+PRODUCTS_PER_PAGE = 50 # roughly what petaljet.com serves, ~15 pages for the full catalog
+
+# the extraction fetch_page used before
+def extract_meta_products_soup(html):
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup.find_all("script"):
+        if script.string and '"products":[' in script.string:
+            match = re.search(r"var meta = (\{.*?\});", script.string, re.DOTALL)
+            if match:
+                return json.loads(match.group(1))["products"]
+    return []
+
+# builds collection pages shaped like petaljet.com: theme markup, a product grid and the meta script
+def build_fixtures():
+    df = pd.read_csv(SNAPSHOT_CSV)
+    products = []
+    for (product_id, name, product_type), group in df.groupby(
+        ["competitor_product_id", "competitor_product_name", "competitor_product_group_name"], sort=False
+    ):
+        products.append({
+            "id": int(product_id),
+            "vendor": "PetalJet",
+            "type": product_type,
+            "variants": [
+                {
+                    "id": int(row.competitor_variant_id),
+                    "price": int(round(row.unit_price * 100)),
+                    "name": f"{name} - {row.stem_length}cm / {row.stems_per_unit} Stems (${row.stem_price:.2f} per stem)",
+                    "public_title": f"{row.stem_length}cm / {row.stems_per_unit} Stems",
+                    "sku": "",
+                }
+                for row in group.itertuples()
+            ],
+        })
+
+    pages = []
+    for start in range(0, len(products), PRODUCTS_PER_PAGE):
+        chunk = products[start:start + PRODUCTS_PER_PAGE]
+        cards = "".join(
+            f'<div class="grid__item"><a href="/products/{p["id"]}" class="card"><img src="//cdn.shopify.com/{p["id"]}.jpg" alt="">'
+            f'<h3 class="card__heading">{p["type"]}</h3><span class="price">${p["variants"][0]["price"] / 100:.2f}</span></a></div>'
+            for p in chunk
+        )
+        meta = json.dumps({"page": {"pageType": "collection"}, "products": chunk}, separators=(",", ":"))
+        pages.append(
+            "<!doctype html><html><head>"
+            + "".join(f'<script src="//cdn.shopify.com/theme/{i}.js" defer></script>' for i in range(40))
+            + f"<script>var meta = {meta};\nfor (var attr in meta) {{ window.ShopifyAnalytics.meta[attr] = meta[attr]; }}</script>"
+            + f'</head><body><main><div class="collection">{cards}</div></main></body></html>'
+        )
+    return pages
+
+def load_fixtures(directory):
+    return [path.read_text(encoding="utf-8") for path in sorted(Path(directory).glob("*.html"))]
+
+def bench(parser, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = sum(len(parser(html)) for html in pages)
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", help="directory of saved collection pages (*.html)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures) if args.fixtures else build_fixtures()
+    size_mb = sum(len(html) for html in pages) / 1e6
+    print(f"{len(pages)} pages, {size_mb:.1f} MB")
+
+    for html in pages:
+        assert extract_meta_products(html) == extract_meta_products_soup(html), "parsers disagree"
+
+    soup_time, rows = bench(extract_meta_products_soup, pages, args.repeat)
+    fast_time, _ = bench(extract_meta_products, pages, args.repeat)
+    print(f"{'parser':>14} {'ms/page':>9} {'products':>9}")
+    print(f"{'beautifulsoup':>14} {soup_time / len(pages) * 1000:>9.2f} {rows:>9}")
+    print(f"{'raw_decode':>14} {fast_time / len(pages) * 1000:>9.2f} {rows:>9}")
+    print(f"speedup: {soup_time / fast_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# One product's price over every snapshot: re-parsing all the CSVs in output/ vs the indexed store in modules/history.py.
+# Run from the repo root: python -m benchmarks.price_history [--competitor mayesh --product-id 8448957] [--scale 1 20]
+# The history is built in a scratch database; `scale` repeats every snapshot under made-up eta dates.
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import pandas as pd
+from modules import history, manifest
+from modules.store import typed_table
+
+def legacy_history(csv_frames, product_id):
+    rows = [data[data["competitor_product_id"] == product_id] for data in csv_frames()]
+    return pd.concat(rows, ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--competitor", default="mayesh")
+    parser.add_argument("--product-id", type=int, default=8448957)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 20])
+    args = parser.parse_args()
+
+    snapshots = manifest.snapshots_between(args.competitor, "0000-00-00", "9999-12-31", fmt="csv")
+    print(f"{'snapshots':>10} {'csv parse s':>12} {'history s':>10} {'faster':>8}")
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as directory:
+            history_path = os.path.join(directory, "history.db")
+            conn = history.connect(history_path)
+            paths = [snapshot["path"] for snapshot in snapshots] * scale
+            with contextlib.redirect_stdout(io.StringIO()):
+                for n, path in enumerate(paths):
+                    history.ingest_snapshot(args.competitor, f"{n:05d}", typed_table(pd.read_csv(path), args.competitor), conn)
+            conn.close()
+
+            start = time.perf_counter()
+            legacy_history(lambda: (pd.read_csv(path) for path in paths), args.product_id)
+            legacy_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            history.product_history(args.competitor, args.product_id, history_path=history_path)
+            history_time = time.perf_counter() - start
+            print(f"{len(paths):>10} {legacy_time:>12.3f} {history_time:>10.4f} {legacy_time / history_time:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Times modules/diff.py on two consecutive snapshots repeated `scale` times (the repeats pair up through the
+# "#n" suffix of the offer key, so the feed just grows with them).
+# Run from the repo root: python -m benchmarks.snapshot_diff [--competitor mayesh] [--scale 1 100 300]
+
+import argparse
+import time
+import pandas as pd
+from modules import manifest
+from modules.diff import diff_snapshots
+from modules.store import typed_table
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--competitor", default="mayesh")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 100, 300])
+    args = parser.parse_args()
+
+    old, new = manifest.snapshots_between(args.competitor, "0000-00-00", "9999-12-31", fmt="csv")[-2:]
+    old_data, new_data = pd.read_csv(old["path"]), pd.read_csv(new["path"])
+    print(f"{old['eta_date']} -> {new['eta_date']}")
+    print(f"{'rows':>9} {'events':>8} {'diff s':>8}")
+    for scale in args.scale:
+        old_table = typed_table(pd.concat([old_data] * scale, ignore_index=True), args.competitor)
+        new_table = typed_table(pd.concat([new_data] * scale, ignore_index=True), args.competitor)
+        start = time.perf_counter()
+        feed = diff_snapshots(old_table, new_table, args.competitor, old["eta_date"], new["eta_date"])
+        elapsed = time.perf_counter() - start
+        print(f"{new_table.num_rows:>9} {len(feed):>8} {elapsed:>8.3f}")
+
+if __name__ == "__main__":
+    main()
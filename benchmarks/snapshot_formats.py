@@ -0,0 +1,53 @@
+# Compares the CSV snapshots with the typed Parquet snapshots from modules/store.py: file size and load time.
+# Run from the repo root: python -m benchmarks.snapshot_formats [--scale 1 100]
+# Each competitor's newest CSV in output/ is repeated `scale` times, written both ways and read back.
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import tempfile
+import time
+import pandas as pd
+from modules.store import read_parquet, save_to_parquet
+
+SNAPSHOTS = {
+    "mayesh": "output/mayesh/mayesh_inventory_*.csv",
+    "flowermarketplace": "output/flowermarketplace/flowermarketplace_inventory_*.csv",
+    "petaljet": "output/petaljet/*_inventory_*.csv",
+}
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+
+    print(f"{'competitor':>18} {'rows':>9} {'csv MB':>8} {'parquet MB':>11} {'smaller':>8} {'csv load s':>11} {'parquet load s':>15} {'faster':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for competitor, pattern in SNAPSHOTS.items():
+            snapshot = pd.read_csv(max(glob.glob(pattern), key=lambda path: path.rsplit("_", 1)[-1]))
+            for scale in args.scale:
+                df = pd.concat([snapshot] * scale, ignore_index=True)
+                csv_path = os.path.join(directory, f"{competitor}_{scale}.csv")
+                df.to_csv(csv_path, index=False)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    parquet_path = save_to_parquet(df, competitor, f"scale-{scale}", output_root=directory, record=False)
+
+                csv_size = os.path.getsize(csv_path) / 1e6
+                parquet_size = os.path.getsize(parquet_path) / 1e6
+                csv_load = best_of(lambda: pd.read_csv(csv_path))
+                parquet_load = best_of(lambda: read_parquet(competitor, f"scale-{scale}", output_root=directory))
+                print(f"{competitor:>18} {len(df):>9} {csv_size:>8.2f} {parquet_size:>11.2f} {csv_size / parquet_size:>7.1f}x"
+                      f" {csv_load:>11.3f} {parquet_load:>15.3f} {csv_load / parquet_load:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
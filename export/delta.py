@@ -0,0 +1,134 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import pandas as pd
+import pyarrow as pa
+from modules.diff import OFFER_KEYS
+from modules.store import PANDAS_TYPES
+
+# Delta export: only rows that are new or changed since the last export to the same sink are shipped.
+# Every row gets a stable key (competitor, offer id, eta_date) and a hash of its values; both are kept in
+# EXPORT_STATE_DB after a successful write, together with a per sink/competitor watermark. Rerunning an
+# export for a snapshot that was already shipped writes nothing. The sink replaces rows by their key columns
+# (ROW_KEYS) rather than appending, so an offer whose values changed keeps one version: the latest. Rows that
+# share every key column are shipped together whenever one of them changed.
+STATE_DB = os.getenv("EXPORT_STATE_DB", "output/export_state.db")
+
+# an offer within one snapshot (see OFFER_KEYS in modules/diff.py for why Mayesh needs more than the product id)
+ROW_KEYS = {competitor: keys + ["eta_date"] for competitor, keys in OFFER_KEYS.items()}
+VOLATILE_COLUMNS = ["created_at"] # changes every run without the offer changing
+
+CREATE_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS exported_rows (
+        sink TEXT,
+        competitor TEXT,
+        row_key TEXT,
+        row_hash INTEGER,
+        eta_date TEXT,
+        PRIMARY KEY (sink, competitor, row_key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS watermarks (
+        sink TEXT,
+        competitor TEXT,
+        eta_date TEXT,
+        snapshot_hash TEXT,
+        exported_rows INTEGER,
+        exported_at TEXT,
+        PRIMARY KEY (sink, competitor)
+    )
+    """,
+]
+UPSERT_ROW_SQL = """
+INSERT INTO exported_rows (sink, competitor, row_key, row_hash, eta_date) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (sink, competitor, row_key) DO UPDATE SET row_hash = excluded.row_hash
+"""
+UPSERT_WATERMARK_SQL = """
+INSERT INTO watermarks (sink, competitor, eta_date, snapshot_hash, exported_rows, exported_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (sink, competitor) DO UPDATE SET
+    eta_date = excluded.eta_date, snapshot_hash = excluded.snapshot_hash,
+    exported_rows = excluded.exported_rows, exported_at = excluded.exported_at
+"""
+
+state_lock = threading.Lock() # the competitors export in parallel threads, state writes go one at a time
+
+def connect_state(path=None):
+    path = path or STATE_DB
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    for sql in CREATE_SQL:
+        conn.execute(sql)
+    return conn
+
+# "<competitor>|<key values>", what the sink replaces rows by
+def offer_group_keys(df, competitor):
+    keys = pd.Series(competitor, index=df.index, dtype=object)
+    for column in ROW_KEYS[competitor]:
+        values = df[column].astype(object)
+        keys = keys + "|" + values.where(values.notna(), "").astype(str)
+    return keys
+
+# "<competitor>|<key values>#<n>", n numbers rows that share every key column so exact repeats stay distinct
+def row_keys(offers):
+    return offers + "#" + offers.groupby(offers).cumcount().astype(str)
+
+def row_hashes(df):
+    values = df.drop(columns=[column for column in VOLATILE_COLUMNS if column in df])
+    return pd.Series(pd.util.hash_pandas_object(values, index=False).to_numpy().view("int64"), index=df.index)
+
+def snapshot_hash(keys, hashes):
+    digest = hashlib.sha256()
+    for key, value in sorted(zip(keys, hashes)):
+        digest.update(f"{key}={value}\n".encode())
+    return digest.hexdigest()
+
+# writes the rows of `table` that the sink hasn't seen yet (or has seen with other values), returns the row count
+def export_delta(competitor, eta_date, table, sink, state_path=None):
+    df = table.to_pandas(types_mapper=PANDAS_TYPES.get)
+    offers = offer_group_keys(df, competitor)
+    keys = row_keys(offers)
+    hashes = row_hashes(df)
+    current_hash = snapshot_hash(keys, hashes)
+
+    conn = connect_state(state_path)
+    try:
+        watermark = conn.execute(
+            "SELECT eta_date, snapshot_hash FROM watermarks WHERE sink = ? AND competitor = ?", (sink.name, competitor)
+        ).fetchone()
+        if watermark == (str(eta_date), current_hash):
+            print(f"⏭️ {competitor} {eta_date} was already exported to {sink.name}, nothing to do")
+            return 0
+
+        previous = pd.Series(dict(conn.execute(
+            "SELECT row_key, row_hash FROM exported_rows WHERE sink = ? AND competitor = ? AND eta_date = ?",
+            (sink.name, competitor, str(eta_date)),
+        )), dtype="Int64")
+        previous_hashes = previous.reindex(keys.to_numpy())
+        changed = previous_hashes.isna().to_numpy() | (previous_hashes.to_numpy(dtype="int64", na_value=0) != hashes.to_numpy())
+        changed |= offers.isin(offers[changed]).to_numpy() # the sink replaces whole offers
+
+        rows = 0
+        if changed.any():
+            rows = sink.write(competitor, table.filter(pa.array(changed)), keys=ROW_KEYS[competitor])
+
+        # only recorded once the sink accepted the rows, a failed write is retried in full next time
+        with state_lock, conn:
+            conn.executemany(UPSERT_ROW_SQL, zip(
+                [sink.name] * int(changed.sum()),
+                [competitor] * int(changed.sum()),
+                keys[changed].tolist(),
+                hashes[changed].tolist(),
+                [str(eta_date)] * int(changed.sum()),
+            ))
+            conn.execute(UPSERT_WATERMARK_SQL, (
+                sink.name, competitor, str(eta_date), current_hash, rows, datetime.datetime.now().isoformat(timespec="seconds"),
+            ))
+    finally:
+        conn.close()
+
+    print(f"🔁 {competitor} {eta_date}: {int(changed.sum())} of {len(df)} rows new or changed")
+    return rows
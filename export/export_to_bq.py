@@ -1,67 +1,76 @@
+import argparse
+import asyncio
+import functools
+import os
 import pandas as pd
-import pandas_gbq
+import pyarrow.parquet as pq
 from google.oauth2 import service_account
 from dotenv import load_dotenv
-import os
-import datetime
-from modules.latest_eta_date import (       # ETA's are the same but output is spread out over 3 directories
-    get_latest_eta_date_flowermarketplace,
-    get_latest_eta_date_mayesh,
-    get_latest_eta_date_petaljet
-)
+from export.delta import export_delta
+from export.sinks import get_sink
+from modules import manifest
+from modules.store import typed_table
 
 load_dotenv()
 
-credentials = service_account.Credentials.from_service_account_file('config/service_key.json')
+SERVICE_KEY_PATH = 'config/service_key.json'
+EXPORT_MODE = os.getenv("EXPORT_MODE", "delta") # delta: only new / changed rows (see export/delta.py), full: the whole snapshot
 
-project_id = os.getenv("PROJECT_ID")
-dataset_id = os.getenv("DATASET_ID")
+# loaded on first upload so the scrapers can be imported without the service key
+@functools.lru_cache(maxsize=None)
+def get_credentials():
+    return service_account.Credentials.from_service_account_file(SERVICE_KEY_PATH)
 
-# Each of the following functions can be used to push the freshest csv to BigQuery
-def upload_flowermarketplace_to_bigquery():
-    latest_file_path = get_latest_eta_date_flowermarketplace("./output/flowermarketplace")
-    data = pd.read_csv(latest_file_path)
+COMPETITORS = ["mayesh", "flowermarketplace", "petaljet"]
+
+# the freshest snapshot in the manifest as a typed table: its Parquet file when the scraper wrote one, else the CSV
+def latest_snapshot(competitor):
+    snapshot = manifest.latest_snapshot(competitor)
+    if snapshot is None:
+        raise FileNotFoundError(f"no {competitor} snapshots in the manifest")
+    eta_date = snapshot["eta_date"]
+    if snapshot["format"] == "parquet":
+        return eta_date, pq.read_table(snapshot["path"])
+    data = pd.read_csv(snapshot["path"])
     data.columns = [col.strip().replace(" ", "_").replace(",", "").lower() for col in data.columns]
-    table_id_flowermarketplace = os.getenv("TABLE_ID_FLOWERMARKETPLACE")
-    table_full_id_flowermarketplace = f"{project_id}.{dataset_id}.{table_id_flowermarketplace}"
-    pandas_gbq.to_gbq(
-        data,  
-        table_full_id_flowermarketplace, 
-        project_id=project_id,  
-        credentials=credentials,
-        if_exists="append",  
-        chunksize=1000, 
-    )
-    print(f"✅ Data with date {latest_file_path} for flowermarketplace successfully uploaded to BigQuery")
-        
+    return eta_date, typed_table(data, competitor)
+
+def export_snapshot(competitor, sink=None, mode=None):
+    sink = sink or get_sink()
+    eta_date, table = latest_snapshot(competitor)
+    if (mode or EXPORT_MODE) == "delta":
+        rows = export_delta(competitor, eta_date, table, sink)
+    else:
+        rows = sink.write(competitor, table)
+    print(f"✅ {rows} rows with date {eta_date} for {competitor} successfully exported to {sink.name}")
+    return rows
+
+# Each of the following functions can be used to push the freshest snapshot to BigQuery (or the EXPORT_SINK in use)
+def upload_flowermarketplace_to_bigquery():
+    return export_snapshot("flowermarketplace")
+
 def upload_petaljet_to_bigquery():
-    latest_file_path = get_latest_eta_date_petaljet("./output/petaljet")
-    data = pd.read_csv(latest_file_path)
-    data.columns = [col.strip().replace(" ", "_").replace(",", "").lower() for col in data.columns]
-    table_id_petaljet = os.getenv("TABLE_ID_PETALJET")
-    table_full_id_petaljet = f"{project_id}.{dataset_id}.{table_id_petaljet}"
-    pandas_gbq.to_gbq(
-        data,  
-        table_full_id_petaljet, 
-        project_id=project_id,  
-        credentials=credentials,
-        if_exists="append",  
-        chunksize=1000, 
-    )
-    print(f"✅ Data with date {latest_file_path} for petaljet successfully uploaded to BigQuery")
+    return export_snapshot("petaljet")
 
 def upload_mayesh_to_bigquery():
-    latest_file_path = get_latest_eta_date_mayesh("./output/mayesh")
-    data = pd.read_csv(latest_file_path)
-    data.columns = [col.strip().replace(" ", "_").replace(",", "").lower() for col in data.columns]
-    table_id_mayesh = os.getenv("TABLE_ID_MAYESH")
-    table_full_id_mayesh = f"{project_id}.{dataset_id}.{table_id_mayesh}"
-    pandas_gbq.to_gbq(
-        data,
-        table_full_id_mayesh,
-        project_id=project_id,
-        credentials=credentials,
-        if_exists="append",
-        chunksize=1000,
+    return export_snapshot("mayesh")
+
+# exports every competitor's freshest snapshot at the same time, one thread per upload
+async def export_all(competitors=tuple(COMPETITORS), sink=None, mode=None):
+    results = await asyncio.gather(
+        *(asyncio.to_thread(export_snapshot, competitor, sink, mode) for competitor in competitors),
+        return_exceptions=True,
     )
-    print(f"✅ Data with date {latest_file_path} for mayesh successfully uploaded to BigQuery")
+    for competitor, result in zip(competitors, results):
+        if isinstance(result, Exception):
+            print(f"❌ Failed to export {competitor}: {result}")
+    return dict(zip(competitors, results))
+
+# python -m export.export_to_bq [--sink sqlite] [--mode full] [--only mayesh petaljet]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sink", choices=["bigquery", "sqlite"], default=None)
+    parser.add_argument("--mode", choices=["delta", "full"], default=None)
+    parser.add_argument("--only", nargs="+", choices=COMPETITORS, default=COMPETITORS)
+    args = parser.parse_args()
+    asyncio.run(export_all(args.only, get_sink(args.sink), args.mode))
@@ -0,0 +1,171 @@
+import functools
+import io
+import os
+import sqlite3
+import threading
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Export sinks: where a typed snapshot (a pyarrow table with a modules/store.py schema) ends up.
+# Both take the whole table at once and return the number of rows written; EXPORT_SINK picks one.
+# Without `keys` the rows are appended, with `keys` (a delta, see export/delta.py) they replace the rows
+# that have the same values in those columns, so a changed row doesn't end up next to its old version.
+#   bigquery: one Parquet load job per snapshot, appended to TABLE_ID_<COMPETITOR> in PROJECT_ID.DATASET_ID,
+#             a delta is loaded into a staging table and swapped in by one DELETE + INSERT transaction
+#   sqlite:   a local database (EXPORT_DB, output/export.db), one table per competitor, no cloud needed
+
+# BigQuery column types -> arrow types, used to line a snapshot up with an existing table
+BQ_ARROW_TYPES = {
+    "STRING": pa.string(),
+    "INTEGER": pa.int64(),
+    "INT64": pa.int64(),
+    "FLOAT": pa.float64(),
+    "FLOAT64": pa.float64(),
+    "BOOLEAN": pa.bool_(),
+    "BOOL": pa.bool_(),
+    "DATE": pa.date32(),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+}
+
+# replaces the destination rows whose key columns match a staged row, keys compare null-safe
+REPLACE_SQL = """
+BEGIN TRANSACTION;
+DELETE FROM `{target}` AS target WHERE EXISTS (SELECT 1 FROM `{staging}` AS staging WHERE {match});
+INSERT INTO `{target}` ({columns}) SELECT {columns} FROM `{staging}`;
+COMMIT TRANSACTION;
+"""
+
+class BigQuerySink:
+    name = "BigQuery"
+
+    def __init__(self, project_id=None, dataset_id=None, credentials=None):
+        self.project_id = project_id or os.getenv("PROJECT_ID")
+        self.dataset_id = dataset_id or os.getenv("DATASET_ID")
+        self.credentials = credentials
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from google.cloud import bigquery
+                from export.export_to_bq import get_credentials
+                self._client = bigquery.Client(project=self.project_id, credentials=self.credentials or get_credentials())
+            return self._client
+
+    def table_id(self, competitor):
+        return f"{self.project_id}.{self.dataset_id}.{os.getenv(f'TABLE_ID_{competitor.upper()}')}"
+
+    def destination(self, table_id):
+        from google.api_core.exceptions import NotFound
+        try:
+            return self.client().get_table(table_id)
+        except NotFound:
+            return None
+
+    # the tables pandas_gbq created were typed from the CSVs (dates as STRING, stem lengths as FLOAT),
+    # cast our columns to whatever the destination already uses so the append doesn't fail
+    def align(self, table, destination):
+        for bq_field in destination.schema:
+            arrow_type = BQ_ARROW_TYPES.get(bq_field.field_type)
+            index = table.schema.get_field_index(bq_field.name)
+            if arrow_type is None or index == -1 or table.schema.field(index).type == arrow_type:
+                continue
+            table = table.set_column(index, bq_field.name, table.column(index).cast(arrow_type))
+        return table
+
+    def load(self, table, table_id, append=True):
+        from google.cloud import bigquery
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression="zstd")
+        buffer.seek(0)
+        job_config = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.PARQUET)
+        if append:
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+            job_config.schema_update_options = [bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION]
+        else:
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+        job = self.client().load_table_from_file(buffer, table_id, job_config=job_config)
+        job.result()
+        return job.output_rows
+
+    def write(self, competitor, table, keys=None):
+        table_id = self.table_id(competitor)
+        destination = self.destination(table_id)
+        if destination is None:
+            return self.load(table, table_id)
+        table = self.align(table, destination)
+        if not keys:
+            return self.load(table, table_id)
+
+        client = self.client()
+        staging_id = f"{table_id}_staging_{uuid.uuid4().hex[:12]}"
+        try:
+            self.load(table, staging_id, append=False)
+            # columns the snapshot gained since the table was created, the append path adds them the same way
+            known = {bq_field.name for bq_field in destination.schema}
+            missing = [bq_field for bq_field in client.get_table(staging_id).schema if bq_field.name not in known]
+            if missing:
+                destination.schema = list(destination.schema) + missing
+                client.update_table(destination, ["schema"])
+            client.query(REPLACE_SQL.format(
+                target=table_id,
+                staging=staging_id,
+                match=" AND ".join(f"target.`{key}` IS NOT DISTINCT FROM staging.`{key}`" for key in keys),
+                columns=", ".join(f"`{name}`" for name in table.column_names),
+            )).result()
+        finally:
+            client.delete_table(staging_id, not_found_ok=True)
+        return table.num_rows
+
+SQLITE_TYPES = {"int": "INTEGER", "double": "REAL", "float": "REAL", "bool": "INTEGER"}
+
+class SQLiteSink:
+    name = "SQLite"
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("EXPORT_DB", "output/export.db")
+        self._lock = threading.Lock() # one writer at a time, the uploads run in parallel threads
+
+    def write(self, competitor, table, keys=None):
+        columns = []
+        for field in table.schema:
+            sqlite_type = next((t for prefix, t in SQLITE_TYPES.items() if str(field.type).startswith(prefix)), "TEXT")
+            columns.append((field.name, sqlite_type))
+        # dates go in as ISO strings, sqlite3's default date adapter is deprecated
+        arrays = [
+            column.cast(pa.string()) if pa.types.is_temporal(column.type) else column
+            for column in table.columns
+        ]
+        values = {name: array.to_pylist() for name, array in zip(table.column_names, arrays)}
+        rows = zip(*values.values())
+
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute(f'CREATE TABLE IF NOT EXISTS "{competitor}" ({", ".join(f"{name} {kind}" for name, kind in columns)})')
+                existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{competitor}")')}
+                for name, kind in columns:
+                    if name not in existing:
+                        conn.execute(f'ALTER TABLE "{competitor}" ADD COLUMN {name} {kind}')
+                if keys:
+                    match = " AND ".join(f"{key} IS ?" for key in keys) # IS: null-safe equality
+                    conn.executemany(f'DELETE FROM "{competitor}" WHERE {match}', set(zip(*(values[key] for key in keys))))
+                names = ", ".join(name for name, _ in columns)
+                placeholders = ", ".join("?" for _ in columns)
+                conn.executemany(f'INSERT INTO "{competitor}" ({names}) VALUES ({placeholders})', rows)
+                conn.commit()
+            finally:
+                conn.close()
+        return table.num_rows
+
+SINKS = {"bigquery": BigQuerySink, "sqlite": SQLiteSink}
+
+@functools.lru_cache(maxsize=None)
+def get_sink(kind=None):
+    kind = (kind or os.getenv("EXPORT_SINK", "bigquery")).lower()
+    if kind not in SINKS:
+        raise ValueError(f"unknown export sink {kind!r}, expected one of {sorted(SINKS)}")
+    return SINKS[kind]()
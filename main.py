@@ -1,37 +1,78 @@
-from modules.scrape.mayesh import fetch_available_dates, fetch_inventory
-from modules.data import process_inventory_data
-from modules.store import save_to_csv
+import asyncio
+import os
+from dotenv import load_dotenv
+from modules.scrape.mayesh import fetch_available_dates, fetch_inventory_async
+from modules.scrape import dvflora, flowermarketplace, petaljet
+from modules.data import process_inventory_frame
+from modules.store import save_to_csv, save_to_parquet
+from modules.history import append_snapshot
+from modules.diff import write_change_feed
 from modules.stealth import random_delay, get_random_user_agent
 from modules.auth import authenticate
+from modules.client import closing_clients, get_client
 from export.export_to_bq import upload_mayesh_to_bigquery
-from dotenv import load_dotenv
-import os
 
 load_dotenv()
 
 EMAIL = os.getenv("EMAIL")
 PASSWORD = os.getenv("PASSWORD")
 
-session, headers = authenticate(EMAIL, PASSWORD)
-
-if session and headers:
-    delivery_date = fetch_available_dates(session, headers)
-    
-    if delivery_date:
-        headers["User-Agent"] = get_random_user_agent()
-        random_delay()
-
-        raw_inventory = fetch_inventory(session, headers, delivery_date)
-        
-        if raw_inventory:
-            processed_inventory = process_inventory_data(raw_inventory, delivery_date)
-            filename = f"mayesh_inventory_{delivery_date}.csv"
-            save_to_csv(processed_inventory, filename, subdir="mayesh", output_root="output")
-
-            csv_path = os.path.join("output", "mayesh", filename)
-            try:
-                upload_mayesh_to_bigquery()
-                print(f"✅ Data with date {delivery_date} for Mayesh successfully uploaded to BigQuery")
-            except Exception as e:
-                print(f"Error uploading data to BigQuery: {e}")
+# collects the inventory pages as they arrive, then normalizes them in one columnar pass off the event loop:
+# a single call over the whole inventory beats one per page, the per-call overhead of the column ops dominates a page
+async def run_mayesh(client, headers, delivery_date):
+    headers = dict(headers)
+    headers["User-Agent"] = get_random_user_agent()
+    await random_delay()
+
+    pages = {}
+    def on_page(page, products):
+        pages[page] = products
+
+    await fetch_inventory_async(client, headers, delivery_date, on_page)
+
+    if pages:
+        products = [product for page in sorted(pages) for product in pages[page]]
+        processed_inventory = await asyncio.to_thread(process_inventory_frame, products, delivery_date)
+        print(f"✅ Processed {len(processed_inventory)} products for {delivery_date}")
+        filename = f"mayesh_inventory_{delivery_date}.csv"
+        # file and SQLite writes run in a worker thread, one after the other, so the other scrapers keep going
+        await asyncio.to_thread(save_to_csv, processed_inventory, filename, subdir="mayesh", output_root="output", competitor="mayesh", eta_date=delivery_date)
+        await asyncio.to_thread(save_to_parquet, processed_inventory, "mayesh", delivery_date)
+        await asyncio.to_thread(append_snapshot, "mayesh", delivery_date)
+        await asyncio.to_thread(write_change_feed, "mayesh", delivery_date)
+
+        try:
+            await asyncio.to_thread(upload_mayesh_to_bigquery)
+            print(f"✅ Data with date {delivery_date} for Mayesh successfully uploaded to BigQuery")
+        except Exception as e:
+            print(f"Error uploading data to BigQuery: {e}")
+
+# logs in to Mayesh once, resolves the ETA date and shares it with every scraper
+async def main():
+    client = get_client()
+    headers = await authenticate(EMAIL, PASSWORD)
+    if not headers:
+        return
+
+    delivery_date = await fetch_available_dates(client, headers)
+    if not delivery_date:
+        print("Failed to fetch eta_date from Mayesh. Exiting.")
+        return
+
+    scrapers = {
+        "Mayesh": run_mayesh(client, headers, delivery_date),
+        "Flowermarketplace": flowermarketplace.main(delivery_date),
+        "PetalJet": petaljet.main(delivery_date),
+        "DVFlora": dvflora.scrape_all(),
+    }
+    results = await asyncio.gather(*scrapers.values(), return_exceptions=True)
+
+    # one failing competitor shouldn't take the others down with it
+    for name, result in zip(scrapers, results):
+        if isinstance(result, Exception):
+            print(f"❌ {name} scrape failed: {result}")
+        else:
+            print(f"✅ {name} scrape finished")
 
+if __name__ == "__main__":
+    asyncio.run(closing_clients(main()))
@@ -1,19 +1,106 @@
-import requests
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+import weakref
+from pathlib import Path
+from modules.client import get_client
+from modules.replay import replay_mode
 
 LOGIN_URL = "https://www.mayesh.com/api/auth/login"
+TOKEN_CACHE = Path(os.getenv("MAYESH_TOKEN_CACHE", ".cache/mayesh_token.json"))
+REFRESH_MARGIN = 300 # seconds before expiry a cached token is replaced
 
-def authenticate(email, password):
-    session = requests.Session()
+locks = weakref.WeakKeyDictionary()
+credentials = {} # from the last authenticate, so a rejected token can be replaced mid-scrape
+
+# reads the exp claim without verifying the signature, the token is only reused by us
+def token_expiry(token):
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, ValueError, TypeError):
+        return 0.0
+
+def account_key(email):
+    return hashlib.sha256(str(email).encode()).hexdigest()
+
+def load_cached_token(email):
+    try:
+        with open(TOKEN_CACHE, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("account") != account_key(email):
+        return None
+    if token_expiry(cached.get("token", "")) - REFRESH_MARGIN <= time.time():
+        return None
+    return cached["token"]
+
+def save_token(email, token):
+    TOKEN_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = TOKEN_CACHE.with_suffix(".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600) # the token is a credential
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"account": account_key(email), "token": token}, f)
+    os.replace(tmp_path, TOKEN_CACHE)
+
+# drops the cached token after the api rejected it, the next authenticate logs in again.
+# With `token` only that token is dropped, one another request already replaced is kept
+def invalidate_token(token=None):
+    if token is not None:
+        try:
+            with open(TOKEN_CACHE, encoding="utf-8") as f:
+                if json.load(f).get("token") != token:
+                    return
+        except (OSError, ValueError):
+            pass
+    try:
+        TOKEN_CACHE.unlink()
+    except FileNotFoundError:
+        pass
+
+async def login(email, password):
+    client = get_client()
     payload = {"email": email, "password": password}
-    headers = {"content-type": "application/json"}
-    response = session.post(LOGIN_URL, json=payload, headers=headers)
+    response = await client.post(LOGIN_URL, json=payload, headers={"content-type": "application/json"})
 
     if response.status_code in [200, 201]:
-        jwt_token = response.json()["data"]["token"]
-        headers["Authorization"] =  f"Bearer {jwt_token}"
-        print("🎉Logged in successfully with {jwt_token}")
-        return session, headers
+        print("🎉Logged in successfully")
+        return response.json()["data"]["token"]
     else:
         print("💔Failed to log in. Wrong credentials?")
-        return None, None
-    
\ No newline at end of file
+        return None
+
+# returns the headers (with the JWT) for the Mayesh api, reusing the cached token until shortly before it expires.
+# Scrapers asking at the same time wait on one lock, so an expired token is refreshed by a single login.
+# Record / replay runs skip the cache so the login itself is recorded and replayed.
+async def authenticate(email, password):
+    credentials.update(email=email, password=password)
+    lock = locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+    async with lock:
+        jwt_token = load_cached_token(email) if replay_mode() not in ("record", "replay") else None
+        if not jwt_token:
+            jwt_token = await login(email, password)
+            if not jwt_token:
+                return None
+            save_token(email, jwt_token)
+
+    return {"content-type": "application/json", "Authorization": f"Bearer {jwt_token}"}
+
+# posts to the Mayesh api; on a 401 the rejected token is dropped, authenticate logs in once more
+# and the request is retried once. The new token is written into `headers`, so later requests use it too
+async def post_authenticated(client, url, payload, headers):
+    response = await client.post(url, json=payload, headers=headers)
+    if response.status_code != 401 or not credentials:
+        return response
+    invalidate_token(headers.get("Authorization", "").removeprefix("Bearer "))
+    fresh = await authenticate(credentials["email"], credentials["password"])
+    if not fresh:
+        return response
+    print("🔑 Mayesh token was rejected, retrying with a new one")
+    headers.update(fresh)
+    return await client.post(url, json=payload, headers=headers)
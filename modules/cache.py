@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+import httpx
+
+# On-disk HTTP cache shared by the scrapers. Responses are keyed by method, url and request body,
+# served straight from disk while younger than the ttl and revalidated with If-None-Match /
+# If-Modified-Since after that, so an unchanged page costs a 304 instead of a full download.
+CACHE_PATH = Path(os.getenv("HTTP_CACHE_PATH", ".cache/http.db"))
+CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "0")) # seconds a response is served without asking, 0 = always revalidate
+CACHE_MAX_BYTES = int(float(os.getenv("HTTP_CACHE_MAX_MB", "500")) * 1024 * 1024)
+CACHE_ENABLED = os.getenv("HTTP_CACHE", "1") != "0"
+
+# record / replay runs (SCRAPE_MODE, see modules/replay.py) skip the cache: a recording has to hold the full
+# response the site sent, not a bodiless 304 to a revalidation, and a replay has to answer what was recorded
+def cache_enabled():
+    return CACHE_ENABLED and os.getenv("SCRAPE_MODE", "").lower() not in ("record", "replay")
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    status INTEGER,
+    headers TEXT,
+    body BLOB,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER,
+    stored_at REAL,
+    accessed_at REAL
+)
+"""
+INDEX_SQL = "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+
+# headers that describe the stored body rather than the original transfer
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+def cache_key(method, url, body=b""):
+    digest = hashlib.sha256()
+    for part in (method.upper().encode(), str(url).encode(), body or b""):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(CREATE_SQL)
+        self.conn.execute(INDEX_SQL)
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        status, headers, body, etag, last_modified, stored_at = row
+        return {
+            "status": status,
+            "headers": json.loads(headers),
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - stored_at < self.ttl,
+        }
+
+    # request headers that turn a refetch into a conditional request
+    def validators(self, entry):
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    # a response is only worth storing when it can be served fresh (ttl > 0) or revalidated later,
+    # otherwise every run downloads it again anyway and the cache only costs a write
+    def storable(self, headers):
+        return self.ttl > 0 or bool(headers.get("etag") or headers.get("last-modified"))
+
+    def touch(self, key, revalidated=False):
+        now = time.time()
+        if revalidated:
+            self.conn.execute("UPDATE responses SET accessed_at = ?, stored_at = ? WHERE key = ?", (now, now, key))
+        else:
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+
+    def put(self, key, url, status, headers, body):
+        headers = {k.lower(): v for k, v in headers.items() if k.lower() not in DROP_HEADERS}
+        old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, str(url), status, json.dumps(headers), body, headers.get("etag"),
+             headers.get("last-modified"), len(body), now, now),
+        )
+        self.total_bytes += len(body) - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        self.conn.commit()
+
+    # drops least recently used responses until the cache is back under 90% of its budget
+    def evict(self):
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        dropped = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            dropped.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", dropped)
+
+    def close(self):
+        self.conn.close()
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+# httpx transport that answers from the cache and revalidates stale entries,
+# plugged into any AsyncClient with `transport=CachingTransport()`
+class CachingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport=None, cache=None, methods=("GET",)):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.cache = cache
+        self.methods = methods
+
+    async def handle_async_request(self, request):
+        if not cache_enabled() or request.method not in self.methods:
+            return await self.transport.handle_async_request(request)
+
+        cache = self.cache or get_cache()
+        key = cache_key(request.method, request.url, await request.aread())
+        entry = cache.get(key)
+        if entry and entry["fresh"]:
+            cache.touch(key)
+            return self.cached_response(request, entry)
+        if entry:
+            request.headers.update(cache.validators(entry))
+
+        response = await self.transport.handle_async_request(request)
+        if entry and response.status_code == 304:
+            await response.aclose()
+            cache.touch(key, revalidated=True)
+            return self.cached_response(request, entry)
+
+        if response.status_code == 200 and cache.storable(response.headers):
+            body = await response.aread()
+            cache.put(key, request.url, response.status_code, response.headers, body)
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in DROP_HEADERS]
+            return httpx.Response(200, headers=headers, content=body, request=request)
+        return response
+
+    def cached_response(self, request, entry):
+        return httpx.Response(entry["status"], headers=entry["headers"], content=entry["body"], request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+# same cache for aiohttp users: returns the body text of a GET, revalidating stale entries
+async def aiohttp_get_text(session, url, cache=None, **kwargs):
+    if not cache_enabled():
+        async with session.get(url, **kwargs) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    cache = cache or get_cache()
+    key = cache_key("GET", url)
+    entry = cache.get(key)
+    if entry and entry["fresh"]:
+        cache.touch(key)
+        return entry["body"].decode(response_charset(entry["headers"]), errors="replace")
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry:
+        headers.update(cache.validators(entry))
+    async with session.get(url, headers=headers, **kwargs) as response:
+        if entry and response.status == 304:
+            cache.touch(key, revalidated=True)
+            return entry["body"].decode(response_charset(entry["headers"]), errors="replace")
+        response.raise_for_status()
+        body = await response.read()
+        if cache.storable(response.headers):
+            cache.put(key, url, response.status, dict(response.headers), body)
+        return body.decode(response.get_encoding(), errors="replace")
+
+def response_charset(headers):
+    content_type = headers.get("content-type", "")
+    if "charset=" in content_type:
+        return content_type.split("charset=")[-1].split(";")[0].strip()
+    return "utf-8"
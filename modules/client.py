@@ -0,0 +1,69 @@
+import asyncio
+import weakref
+import aiohttp
+import httpx
+from modules.cache import CachingTransport
+from modules.ratelimit import RateLimitedTransport
+from modules.replay import httpx_transport, replay_session
+from modules.stealth import get_random_user_agent
+
+# Shared HTTP clients for every scraper, one set per event loop. httpx keeps a keep-alive pool per origin
+# and negotiates HTTP/2 where the server offers it, so Mayesh, Flowermarketplace, PetalJet and the URL
+# collector reuse connections (and their TLS handshakes and DNS lookups) instead of opening their own.
+# DVFlora stays on aiohttp, its session gets a DNS cache and the same timeouts.
+
+TIMEOUT = 60 # seconds, same for every scraper
+CONNECT_TIMEOUT = 10
+MAX_CONNECTIONS = 100
+KEEPALIVE_EXPIRY = 60
+DNS_CACHE_TTL = 300
+DEFAULT_HEADERS = {"User-Agent": get_random_user_agent()}
+
+clients = weakref.WeakKeyDictionary()
+
+def _loop_clients():
+    return clients.setdefault(asyncio.get_running_loop(), {})
+
+# cache -> per-host rate limiter -> record/replay -> pooled HTTP/2 transport (no cache in record / replay runs)
+def get_client():
+    loop_clients = _loop_clients()
+    if "httpx" not in loop_clients:
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY)
+        transport = CachingTransport(RateLimitedTransport(httpx_transport(http2=True, limits=limits)))
+        loop_clients["httpx"] = httpx.AsyncClient(
+            transport=transport,
+            headers=DEFAULT_HEADERS,
+            timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+    return loop_clients["httpx"]
+
+def get_aiohttp_session():
+    loop_clients = _loop_clients()
+    if "aiohttp" not in loop_clients:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=MAX_CONNECTIONS,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_EXPIRY,
+        )
+        loop_clients["aiohttp"] = replay_session(aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=TIMEOUT, connect=CONNECT_TIMEOUT),
+        ))
+    return loop_clients["aiohttp"]
+
+async def close_clients():
+    loop_clients = clients.pop(asyncio.get_running_loop(), {})
+    for name, client in loop_clients.items():
+        if name == "httpx":
+            await client.aclose()
+        else:
+            await client.close()
+
+# entry points wrap their coroutine in this so the shared clients are closed once everything is done
+async def closing_clients(coro):
+    try:
+        return await coro
+    finally:
+        await close_clients()
@@ -1,67 +1,91 @@
 from datetime import datetime
 import pandas as pd
+from modules.mappings import LazyMapping, column_mapping
 
-#Reads Productgroups.csv to map their productgroup id's on our productgroup KEY
-product_group_mapping = pd.read_csv("mapping/mayesh_productgroups.csv")
-mapping_dict = dict(zip(product_group_mapping['competitor_product_group'].astype(str), 
-                       product_group_mapping['ibf_product_group']))
+#Reads Productgroups.csv to map their productgroup id's on our productgroup KEY (loaded on first lookup)
+mapping_dict = LazyMapping("mapping/mayesh_productgroups.csv", column_mapping('competitor_product_group', 'ibf_product_group'))
 
 def get_ibf_product_group(category_id):
     return mapping_dict.get(str(category_id))
-  
+
 #Reads Varieties.csv to map their Variety id's on our Variety _KEYS
-variety_mapping = pd.read_csv("mapping/mayesh_varieties.csv")
-variety_mapping_dict = dict(zip(variety_mapping['competitor_variety'].astype(str),
-                                variety_mapping['ibf_variety']))
+variety_mapping_dict = LazyMapping("mapping/mayesh_varieties.csv", column_mapping('competitor_variety', 'ibf_variety'))
 
 def get_ibf_variety(variety_name):
     return variety_mapping_dict.get(str(variety_name))
 
-def extract_stem_length(grade_name):
-    if not grade_name:
-        return None
-    import re
-    numbers = re.findall(r'\d+', str(grade_name))
-    return int(numbers[0]) if numbers else None
+INVENTORY_COLUMNS = [
+    "created_at", "eta_date", "state", "competitor", "grower_name", "grower_country",
+    "competitor_product_id", "competitor_product_name", "competitor_product_group_name", "competitor_product_group_id",
+    "product_group_key", "variety_key", "stem_length", "color_name", "competitor_product_url", "competitor_product_image",
+    "available_units", "stems_per_unit", "stem_price", "unit_price", "base_price", "freight_price", "margin",
+    "competitor_highlight_name",
+]
 
-def process_inventory_data(products, date):
-    extracted_data = []
-    today = datetime.now().strftime('%Y-%m-%d')
+# one field of the raw products as an object column, with product.get(name, default) semantics:
+# ints stay ints and an explicit null stays empty, the same values the csv writer saw before
+def field(products, name, default=None):
+    return pd.Series([product.get(name, default) for product in products], dtype=object)
+
+# runs fn over the distinct values only and broadcasts the result back, ids, grades and prices repeat across products
+def per_unique(values, fn):
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    result = fn(pd.Series(uniques, dtype=object))
+    return pd.Series(result.to_numpy()[codes], index=values.index, dtype=result.dtype)
+
+def truthy(values):
+    return values.notna() & values.astype(bool)
 
-    for product in products:
-        mayesh_category_id = product.get("category_id", 0)
-        ibf_product_group = get_ibf_product_group(mayesh_category_id)
-        mayesh_variety = product.get("product_id", 0)
-        ibf_variety = get_ibf_variety(mayesh_variety)
+# float(value) where the value is truthy, `fallback` elsewhere. An object column so an int fallback (0) is written as 0, not 0.0
+def float_or(values, fallback):
+    mask = truthy(values)
+    return pd.to_numeric(values.where(mask), errors="coerce").astype(float).astype(object).where(mask, fallback)
 
-        extracted_data.append({
-            "created_at": today,
-            "eta_date": date,
-            "state": "Kentucky", #Needed as they apply different pricing per region  
-            "competitor": "Mayesh",
-            "grower_name": product.get("farm_name", "Unknown") if product.get("farm_name") else None,
-            "grower_country": product.get("country_name", None),
-            "competitor_product_id": product.get("product_id", 0),
-            "competitor_product_name": product["name"],
-            "competitor_product_group_name": product.get("category_name", None),
-            "competitor_product_group_id": product.get("category_id", 0),
-            "product_group_key": ibf_product_group,
-            # "variety": product.get("variety_name", None), 
-            "variety_key": ibf_variety,
-            "stem_length": extract_stem_length(product.get("grade_name")),  
-            "color_name": product.get("color_name", None),
-            "competitor_product_url": f"https://www.mayesh.com/{product['seo_url']}",
-            "competitor_product_image": f"https://www.mayesh.com{product['image']}",
-            "available_units": product["qty"],
-            "stems_per_unit": product.get("unit_count", None), 
-            "stem_price": float(product['price_per_stem']) if product.get("price_per_stem") else None,
-            "unit_price": float(product['price_per_unit']) if product.get("price_per_unit") else 0,
-            "base_price": product.get("main_landed_cost", 0),
-            "freight_price": product.get("freight", 0),
-            "margin": (1 - (1 / product["markup"])) * 100 if product.get("markup") else 0,
-            "competitor_highlight_name": product.get("highlight_name", None), # will give products tagged with f.e m'day
-            # "competitor_main_landed_cost": product.get("main_landed_cost", 0),
-        })
+def first_number(values):
+    numbers = values[truthy(values)].astype(str).str.extract(r"(\d+)", expand=False)
+    return numbers.reindex(values.index).astype("Int64")
+
+def margin_from_markup(markup):
+    mask = truthy(markup)
+    margin = (1 - 1 / pd.to_numeric(markup.where(mask), errors="coerce").astype(float)) * 100
+    return margin.astype(object).where(mask, 0)
+
+def lookup(mapping):
+    return lambda values: values.astype(str).map(mapping).astype(object)
+
+# turns one delivery date's raw inventory into the inventory table in a single columnar pass:
+# mapping joins, stem length parsing and the price / margin arithmetic run on whole columns (of distinct values)
+def process_inventory_frame(products, date):
+    today = datetime.now().strftime('%Y-%m-%d')
+    index = pd.RangeIndex(len(products))
+    category_id = field(products, "category_id", 0)
+    product_id = field(products, "product_id", 0)
+    farm_name = field(products, "farm_name")
 
-    print(f"✅ Processed {len(products)} products for {date}")
-    return extracted_data
+    inventory = pd.DataFrame({
+        "created_at": today,
+        "eta_date": date,
+        "state": "Kentucky", #Needed as they apply different pricing per region
+        "competitor": "Mayesh",
+        "grower_name": farm_name.where(truthy(farm_name), None),
+        "grower_country": field(products, "country_name"),
+        "competitor_product_id": product_id,
+        "competitor_product_name": field(products, "name"),
+        "competitor_product_group_name": field(products, "category_name"),
+        "competitor_product_group_id": category_id,
+        "product_group_key": lookup(mapping_dict.table())(category_id),
+        "variety_key": lookup(variety_mapping_dict.table())(product_id),
+        "stem_length": per_unique(field(products, "grade_name"), first_number),
+        "color_name": field(products, "color_name"),
+        "competitor_product_url": "https://www.mayesh.com/" + field(products, "seo_url").astype(str),
+        "competitor_product_image": "https://www.mayesh.com" + field(products, "image").astype(str),
+        "available_units": field(products, "qty"),
+        "stems_per_unit": field(products, "unit_count"),
+        "stem_price": per_unique(field(products, "price_per_stem"), lambda values: float_or(values, None)),
+        "unit_price": per_unique(field(products, "price_per_unit"), lambda values: float_or(values, 0)),
+        "base_price": field(products, "main_landed_cost", 0),
+        "freight_price": field(products, "freight", 0),
+        "margin": per_unique(field(products, "markup"), margin_from_markup),
+        "competitor_highlight_name": field(products, "highlight_name"), # will give products tagged with f.e m'day
+    }, index=index, columns=INVENTORY_COLUMNS)
+    return inventory
@@ -0,0 +1,122 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from modules import manifest
+from modules.history import pick_snapshot, read_snapshot
+from modules.store import PANDAS_TYPES
+
+# Snapshot diff: two snapshots of one competitor joined on the offer key, one vectorized merge, and the change
+# feed that falls out of it: new and delisted offers plus price and availability moves. The scrapers write
+# the feed against the previous snapshot to output/changes/<competitor>/<old eta>_<new eta>.csv.
+CHANGES_ROOT = "output/changes"
+
+# what identifies an offer between two snapshots (Mayesh lists a product per grower and box size)
+OFFER_KEYS = {
+    "mayesh": ["competitor_product_id", "grower_name", "grower_country", "stems_per_unit", "stem_length"],
+    "flowermarketplace": ["competitor_product_id"],
+    "petaljet": ["competitor_variant_id"],
+}
+# compared column -> event type, columns a competitor doesn't have are skipped
+CHANGE_EVENTS = {
+    "stem_price": "stem_price_changed",
+    "unit_price": "unit_price_changed",
+    "available_units": "available_units_changed",
+}
+EVENT_TYPES = pd.CategoricalDtype(["new", "delisted", *CHANGE_EVENTS.values()])
+CONTEXT_COLUMNS = ["competitor_product_name", "competitor_product_group_name", "stem_length"]
+EVENT_COLUMNS = ["event", "competitor", "offer_key", *CONTEXT_COLUMNS, "old_eta_date", "new_eta_date", "old_value", "new_value", "change"]
+
+# one integer id per offer, shared by both snapshots: the key columns are grouped once over old and new together and
+# the n-th repeat of a key (offers that share every key column) gets its own id, so repeats pair up one to one
+def offer_ids(old, new, competitor):
+    keys = OFFER_KEYS[competitor]
+    both = pd.concat([old[keys], new[keys]], ignore_index=True)
+    codes = both.groupby(keys, dropna=False, sort=False).ngroup().to_numpy()
+    repeats = pd.Series(codes).groupby([np.repeat([0, 1], [len(old), len(new)]), codes]).cumcount().to_numpy()
+    ids = codes.astype("int64") * (int(repeats.max(initial=0)) + 1) + repeats
+    return ids[:len(old)], ids[len(old):], repeats
+
+# "<key values>#<n>", only built for the offers that made it into the feed
+def offer_keys(rows, competitor):
+    first, *others = [rows[column].astype("string").fillna("") for column in OFFER_KEYS[competitor]]
+    return (first.str.cat(others, sep="|") if others else first) + "#" + rows["repeat"].astype("string")
+
+def as_float(values):
+    return values.to_numpy(dtype="float64", na_value=np.nan)
+
+def events(event, competitor, rows, old_eta_date, new_eta_date, old_value=np.nan, new_value=np.nan):
+    frame = pd.DataFrame({"event": event, "competitor": competitor, "offer_key": offer_keys(rows, competitor)}, index=rows.index)
+    for column in CONTEXT_COLUMNS:
+        frame[column] = rows[column] if column in rows else None
+    frame["old_eta_date"] = str(old_eta_date)
+    frame["new_eta_date"] = str(new_eta_date)
+    frame["old_value"] = old_value
+    frame["new_value"] = new_value
+    frame["change"] = frame["new_value"] - frame["old_value"]
+    return frame
+
+# every change between two snapshots (DataFrames or typed tables) as one event per row, ordered by event type
+def diff_snapshots(old, new, competitor, old_eta_date=None, new_eta_date=None):
+    old = old if isinstance(old, pd.DataFrame) else old.to_pandas(types_mapper=PANDAS_TYPES.get)
+    new = new if isinstance(new, pd.DataFrame) else new.to_pandas(types_mapper=PANDAS_TYPES.get)
+    compared = [column for column in CHANGE_EVENTS if column in old and column in new]
+    described = list(dict.fromkeys(OFFER_KEYS[competitor] + [column for column in CONTEXT_COLUMNS if column in new]))
+
+    old_ids, new_ids, repeats = offer_ids(old, new, competitor)
+    left = old[compared].set_axis(old_ids)
+    right = new[compared].set_axis(new_ids)
+    joined = left.join(right, how="outer", lsuffix="_old", rsuffix="_new")
+    in_old = np.isin(joined.index.to_numpy(), old_ids)
+    in_new = np.isin(joined.index.to_numpy(), new_ids)
+
+    # offer key and context come from the newer snapshot, for delisted offers from the older one
+    old_rows = old[[column for column in described if column in old]].assign(repeat=repeats[:len(old)]).set_axis(old_ids)
+    new_rows = new[described].assign(repeat=repeats[len(old):]).set_axis(new_ids)
+    feed = [
+        events("new", competitor, new_rows.loc[joined.index[in_new & ~in_old]], old_eta_date, new_eta_date),
+        events("delisted", competitor, old_rows.loc[joined.index[in_old & ~in_new]], old_eta_date, new_eta_date),
+    ]
+    both = in_old & in_new
+    for column in compared:
+        before = as_float(joined[f"{column}_old"])
+        after = as_float(joined[f"{column}_new"])
+        changed = both & (before != after) & ~(np.isnan(before) & np.isnan(after))
+        feed.append(events(
+            CHANGE_EVENTS[column], competitor, new_rows.loc[joined.index[changed]],
+            old_eta_date, new_eta_date, before[changed], after[changed],
+        ))
+
+    feed = pd.concat(feed, ignore_index=True)[EVENT_COLUMNS]
+    feed["event"] = feed["event"].astype(EVENT_TYPES)
+    return feed
+
+def changes_path(competitor, old_eta_date, new_eta_date, output_root=CHANGES_ROOT):
+    return os.path.join(output_root, competitor, f"{old_eta_date}_{new_eta_date}.csv")
+
+# diffs a snapshot against the one before it in the manifest and writes the feed, None when there is no earlier one
+def write_change_feed(competitor, eta_date, output_root=CHANGES_ROOT):
+    snapshots = pick_snapshot(manifest.snapshots_between(competitor, "0000-00-00", str(eta_date)))
+    dates = sorted(snapshots)
+    if str(eta_date) not in snapshots or len(dates) < 2:
+        print(f"⏭️ no earlier {competitor} snapshot to diff {eta_date} against")
+        return None
+    old_eta_date, new_eta_date = dates[-2], dates[-1]
+    feed = diff_snapshots(
+        read_snapshot(snapshots[old_eta_date]), read_snapshot(snapshots[new_eta_date]), competitor, old_eta_date, new_eta_date,
+    )
+    file_path = changes_path(competitor, old_eta_date, new_eta_date, output_root)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    feed.to_csv(file_path, index=False)
+    counts = ", ".join(f"{count} {event}" for event, count in feed["event"].value_counts(sort=False).items() if count)
+    print(f"🔀 {competitor} {old_eta_date} -> {new_eta_date}: {counts or 'no changes'}")
+    return file_path
+
+# python -m modules.diff petaljet [--eta-date 2025-04-29]   (defaults to the latest snapshot)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("competitor", choices=list(OFFER_KEYS))
+    parser.add_argument("--eta-date")
+    args = parser.parse_args()
+    eta_date = args.eta_date or (manifest.latest_snapshot(args.competitor) or {}).get("eta_date")
+    write_change_feed(args.competitor, eta_date)
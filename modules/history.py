@@ -0,0 +1,287 @@
+import argparse
+import os
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from modules import manifest
+from modules.store import PANDAS_TYPES, typed_table
+
+# Price history: the offers of every snapshot in one SQLite table, indexed for the two questions we keep asking,
+# "how did this product move over the last N ETA dates" (competitor, competitor_product_id, eta_date) and
+# "what does this variety cost at this stem length" (variety_key, stem_length). Each scrape appends its snapshot,
+# python -m modules.history --ingest loads everything the snapshot manifest knows about.
+# Next to it sits the comparison index: per eta_date, IBF variety and stem length, each competitor's
+# min / median / max stem price. A snapshot only touches its own (competitor, eta_date) slice of it.
+# The product group is only an attribute there: competitors file the same variety under different IBF groups.
+HISTORY_DB = os.getenv("PRICE_HISTORY_DB", "output/price_history.db")
+
+# the columns the three competitors have in common (or that matter for pricing), missing ones stay NULL
+HISTORY_COLUMNS = [
+    "competitor", "competitor_product_id", "competitor_variant_id", "eta_date", "created_at",
+    "competitor_product_name", "product_group_key", "variety_key", "grower_name",
+    "stem_length", "stems_per_unit", "available_units", "stem_price", "unit_price",
+]
+
+CREATE_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS prices (
+        competitor TEXT,
+        competitor_product_id INTEGER,
+        competitor_variant_id INTEGER,
+        eta_date TEXT,
+        created_at TEXT,
+        competitor_product_name TEXT,
+        product_group_key TEXT,
+        variety_key TEXT,
+        grower_name TEXT,
+        stem_length INTEGER,
+        stems_per_unit INTEGER,
+        available_units INTEGER,
+        stem_price REAL,
+        unit_price REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS prices_by_product ON prices (competitor, competitor_product_id, eta_date)",
+    "CREATE INDEX IF NOT EXISTS prices_by_variety ON prices (variety_key, stem_length)",
+    """
+    CREATE TABLE IF NOT EXISTS price_comparison (
+        eta_date TEXT,
+        product_group_key TEXT,
+        variety_key TEXT,
+        stem_length INTEGER,
+        competitor TEXT,
+        offers INTEGER,
+        min_stem_price REAL,
+        median_stem_price REAL,
+        max_stem_price REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS comparison_by_variety ON price_comparison (eta_date, variety_key, stem_length)",
+    "CREATE INDEX IF NOT EXISTS comparison_by_group ON price_comparison (eta_date, product_group_key, stem_length)",
+    "CREATE INDEX IF NOT EXISTS comparison_by_competitor ON price_comparison (competitor, eta_date)",
+    # which file each (competitor, eta_date) was loaded from, so a rerun only loads what changed
+    """
+    CREATE TABLE IF NOT EXISTS ingested (
+        competitor TEXT,
+        eta_date TEXT,
+        path TEXT,
+        written_at TEXT,
+        rows INTEGER,
+        PRIMARY KEY (competitor, eta_date)
+    )
+    """,
+]
+INSERT_SQL = f"INSERT INTO prices ({', '.join(HISTORY_COLUMNS)}) VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})"
+COMPARISON_KEYS = ["variety_key", "stem_length"]
+COMPARISON_COLUMNS = [
+    "eta_date", "product_group_key", *COMPARISON_KEYS, "competitor", "offers", "min_stem_price", "median_stem_price", "max_stem_price",
+]
+COMPARISON_VERSION = 1 # PRAGMA user_version, bumped when the index is keyed differently so older databases rebuild it
+INSERT_COMPARISON_SQL = f"INSERT INTO price_comparison ({', '.join(COMPARISON_COLUMNS)}) VALUES ({', '.join('?' * len(COMPARISON_COLUMNS))})"
+UPSERT_INGESTED_SQL = """
+INSERT INTO ingested (competitor, eta_date, path, written_at, rows) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (competitor, eta_date) DO UPDATE SET
+    path = excluded.path, written_at = excluded.written_at, rows = excluded.rows
+"""
+
+def connect(path=None):
+    path = path or HISTORY_DB
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    for sql in CREATE_SQL:
+        conn.execute(sql)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < COMPARISON_VERSION:
+        rebuild_comparison(conn)
+    return conn
+
+# drops a comparison index built under an older key and refills it from the prices table
+def rebuild_comparison(conn):
+    conn.execute("BEGIN IMMEDIATE") # one connection migrates, the others see the new version once it commits
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= COMPARISON_VERSION:
+        conn.rollback()
+        return
+    conn.execute("DELETE FROM price_comparison")
+    conn.execute(f"PRAGMA user_version = {COMPARISON_VERSION}")
+    conn.commit()
+    backfill_comparison(conn)
+
+# typed snapshot -> rows in HISTORY_COLUMNS order; competitor is the lower case key, dates are ISO strings
+def history_rows(competitor, eta_date, table):
+    columns = []
+    for name in HISTORY_COLUMNS:
+        if name == "competitor":
+            columns.append([competitor] * table.num_rows)
+        elif name == "eta_date" and table.column(name).null_count == table.num_rows:
+            columns.append([str(eta_date)] * table.num_rows) # the early PetalJet files have no eta_date column
+        elif name in table.column_names:
+            column = table.column(name)
+            if pa.types.is_date(column.type):
+                column = column.cast(pa.string())
+            columns.append(column.to_pylist())
+        else:
+            columns.append([None] * table.num_rows)
+    return zip(*columns)
+
+# one competitor's stem price stats for one eta_date, offers without an IBF variety or a price don't compare to anything.
+# product_group_key is the first one the competitor filed the variety under
+def comparison_rows(competitor, eta_date, offers):
+    offers = offers[offers["stem_price"].notna() & offers["variety_key"].notna()]
+    stats = offers.groupby(COMPARISON_KEYS, dropna=False).agg(
+        product_group_key=("product_group_key", "first"),
+        offers=("stem_price", "size"),
+        min_stem_price=("stem_price", "min"),
+        median_stem_price=("stem_price", "median"),
+        max_stem_price=("stem_price", "max"),
+    ).reset_index()
+    stats.insert(0, "eta_date", str(eta_date))
+    stats["competitor"] = competitor
+    stats = stats[COMPARISON_COLUMNS].astype(object)
+    return stats.where(stats.notna(), None).itertuples(index=False, name=None)
+
+def update_comparison(conn, competitor, eta_date, offers):
+    conn.execute("DELETE FROM price_comparison WHERE competitor = ? AND eta_date = ?", (competitor, str(eta_date)))
+    conn.executemany(INSERT_COMPARISON_SQL, comparison_rows(competitor, eta_date, offers))
+
+# replaces whatever was stored for (competitor, eta_date), so re-scraping a date never doubles its rows
+def ingest_snapshot(competitor, eta_date, data, conn=None, source=None):
+    table = data if isinstance(data, pa.Table) else typed_table(data, competitor)
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM prices WHERE competitor = ? AND eta_date = ?", (competitor, str(eta_date)))
+            conn.executemany(INSERT_SQL, history_rows(competitor, eta_date, table))
+            offers = table.select(["product_group_key", *COMPARISON_KEYS, "stem_price"]).to_pandas(types_mapper=PANDAS_TYPES.get)
+            update_comparison(conn, competitor, eta_date, offers)
+            path, written_at = source or (None, None)
+            conn.execute(UPSERT_INGESTED_SQL, (competitor, str(eta_date), path, written_at, table.num_rows))
+    finally:
+        if own_conn:
+            conn.close()
+    return table.num_rows
+
+def read_snapshot(snapshot):
+    if snapshot["format"] == "parquet":
+        return pq.read_table(snapshot["path"])
+    data = pd.read_csv(snapshot["path"])
+    data.columns = [col.strip().replace(" ", "_").replace(",", "").lower() for col in data.columns]
+    return typed_table(data, snapshot["competitor"])
+
+# one snapshot per eta_date, the Parquet file over the CSV when both exist
+def pick_snapshot(snapshots):
+    picked = {}
+    for snapshot in snapshots:
+        if snapshot["eta_date"] not in picked or snapshot["format"] == "parquet":
+            picked[snapshot["eta_date"]] = snapshot
+    return picked
+
+# called by the scrapers right after writing a snapshot
+def append_snapshot(competitor, eta_date, history_path=None):
+    snapshot = pick_snapshot(manifest.snapshots_between(competitor, eta_date, eta_date)).get(str(eta_date))
+    if snapshot is None:
+        raise FileNotFoundError(f"no {competitor} {eta_date} snapshot in the manifest")
+    conn = connect(history_path)
+    try:
+        rows = ingest_snapshot(competitor, eta_date, read_snapshot(snapshot), conn, (snapshot["path"], snapshot["written_at"]))
+    finally:
+        conn.close()
+    print(f"📈 {rows} {competitor} rows added to the price history")
+    return rows
+
+# fills the comparison index for snapshots that were ingested before it existed, straight from the prices table
+def backfill_comparison(conn):
+    missing = conn.execute(
+        "SELECT competitor, eta_date FROM ingested EXCEPT SELECT DISTINCT competitor, eta_date FROM price_comparison"
+    ).fetchall()
+    for competitor, eta_date in missing:
+        offers = pd.read_sql_query(
+            f"SELECT product_group_key, {', '.join(COMPARISON_KEYS)}, stem_price FROM prices WHERE competitor = ? AND eta_date = ?",
+            conn, params=(competitor, eta_date), dtype={"stem_length": "Int64", "stem_price": "float64"},
+        )
+        with conn:
+            update_comparison(conn, competitor, eta_date, offers)
+    return len(missing)
+
+# loads every snapshot in the manifest that isn't in the history yet (or was rewritten since), Parquet over CSV
+def ingest_all(competitors=("mayesh", "flowermarketplace", "petaljet"), history_path=None):
+    conn = connect(history_path)
+    try:
+        backfill_comparison(conn)
+        done = {(row[0], row[1]): (row[2], row[3]) for row in conn.execute("SELECT competitor, eta_date, path, written_at FROM ingested")}
+        rows = 0
+        for competitor in competitors:
+            snapshots = pick_snapshot(manifest.snapshots_between(competitor, "0000-00-00", "9999-12-31"))
+            for eta_date, snapshot in sorted(snapshots.items()):
+                source = (snapshot["path"], snapshot["written_at"])
+                if done.get((competitor, eta_date)) == source:
+                    continue
+                rows += ingest_snapshot(competitor, eta_date, read_snapshot(snapshot), conn, source)
+                print(f"📥 {competitor} {eta_date}: {snapshot['path']}")
+        return rows
+    finally:
+        conn.close()
+
+def _query(sql, params, history_path=None):
+    conn = connect(history_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+# one product's offers over time, oldest first; limit keeps the last N eta dates
+def product_history(competitor, product_id, limit=None, history_path=None):
+    return _query(
+        "SELECT * FROM prices WHERE competitor = ? AND competitor_product_id = ? AND eta_date IN ("
+        "SELECT DISTINCT eta_date FROM prices WHERE competitor = ? AND competitor_product_id = ? ORDER BY eta_date DESC LIMIT ?"
+        ") ORDER BY eta_date",
+        (competitor, int(product_id), competitor, int(product_id), -1 if limit is None else limit), history_path,
+    )
+
+# a variety's offers across all competitors, optionally at one stem length and from a start date on
+def variety_history(variety_key, stem_length=None, start=None, history_path=None):
+    return _query(
+        "SELECT * FROM prices WHERE variety_key = ? AND (? IS NULL OR stem_length = ?) AND (? IS NULL OR eta_date >= ?) "
+        "ORDER BY eta_date, competitor",
+        (variety_key, stem_length, stem_length, start, start), history_path,
+    )
+
+# the comparison index for one eta_date, long format: one row per variety, stem length and competitor.
+# product_group_key filters on the group each competitor filed the variety under
+def price_comparison(eta_date, variety_key=None, product_group_key=None, stem_length=None, history_path=None):
+    return _query(
+        "SELECT * FROM price_comparison WHERE eta_date = ? AND (? IS NULL OR variety_key = ?) "
+        "AND (? IS NULL OR product_group_key = ?) AND (? IS NULL OR stem_length = ?) "
+        f"ORDER BY {', '.join(COMPARISON_KEYS)}, competitor",
+        (str(eta_date), variety_key, variety_key, product_group_key, product_group_key, stem_length, stem_length),
+        history_path,
+    )
+
+# the same side by side, what the dashboards show: one row per variety and stem length, (stat, competitor) columns
+def comparison_matrix(eta_date, **filters):
+    comparison = price_comparison(eta_date, **filters)
+    return comparison.pivot(
+        index=COMPARISON_KEYS, columns="competitor", values=["min_stem_price", "median_stem_price", "max_stem_price"],
+    )
+
+# python -m modules.history --ingest
+# python -m modules.history --product mayesh 8448957 [--limit 60]
+# python -m modules.history --variety <variety_key> [--stem-length 50]
+# python -m modules.history --compare 2025-04-29 [--variety <variety_key>] [--stem-length 50]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ingest", action="store_true")
+    parser.add_argument("--product", nargs=2, metavar=("COMPETITOR", "PRODUCT_ID"))
+    parser.add_argument("--variety")
+    parser.add_argument("--compare", metavar="ETA_DATE")
+    parser.add_argument("--stem-length", type=int)
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+    if args.ingest:
+        print(f"✅ {ingest_all()} rows ingested into {HISTORY_DB}")
+    if args.product:
+        print(product_history(*args.product, limit=args.limit).to_string(index=False))
+    if args.compare:
+        print(comparison_matrix(args.compare, variety_key=args.variety, stem_length=args.stem_length).to_string())
+    elif args.variety:
+        print(variety_history(args.variety, args.stem_length).to_string(index=False))
@@ -0,0 +1,113 @@
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+# Snapshot catalog: one row per competitor, eta_date and format (csv / parquet), written by modules/store.py
+# in the same breath as the file itself. "Latest snapshot" and "snapshots between two dates" are lookups on the
+# primary key instead of globbing and parsing every file name in output/. An empty catalog is filled once from
+# whatever is already in output/ (file names matched case-insensitively, so PetalJet_inventory_* counts too).
+MANIFEST_PATH = os.getenv("SNAPSHOT_MANIFEST", "output/snapshots.db")
+OUTPUT_ROOT = "output"
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    competitor TEXT,
+    eta_date TEXT,
+    format TEXT,
+    path TEXT,
+    rows INTEGER,
+    written_at TEXT,
+    PRIMARY KEY (competitor, eta_date, format)
+)
+"""
+UPSERT_SQL = """
+INSERT INTO snapshots (competitor, eta_date, format, path, rows, written_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (competitor, eta_date, format) DO UPDATE SET
+    path = excluded.path, rows = excluded.rows, written_at = excluded.written_at
+"""
+
+CSV_NAME_RE = re.compile(r"^(?P<competitor>[a-z]+)_inventory_(?P<eta_date>\d{4}-\d{2}-\d{2})\.csv$", re.IGNORECASE)
+PARQUET_NAME_RE = re.compile(r"^(?P<eta_date>\d{4}-\d{2}-\d{2})\.parquet$")
+
+def connect(path=None):
+    path = path or MANIFEST_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute(CREATE_SQL)
+    if conn.execute("SELECT 1 FROM snapshots LIMIT 1").fetchone() is None:
+        with conn:
+            conn.executemany(UPSERT_SQL, scan_output(OUTPUT_ROOT))
+    return conn
+
+# the one-off scan that seeds an empty catalog (or rebuilds it)
+def scan_output(output_root=OUTPUT_ROOT):
+    root = Path(output_root)
+    for csv_path in root.glob("*/*.csv"):
+        match = CSV_NAME_RE.match(csv_path.name)
+        if match:
+            yield snapshot_row(match["competitor"].lower(), match["eta_date"], "csv", csv_path)
+    for parquet_path in root.glob("parquet/*/*.parquet"):
+        match = PARQUET_NAME_RE.match(parquet_path.name)
+        if match:
+            yield snapshot_row(parquet_path.parent.name, match["eta_date"], "parquet", parquet_path)
+
+def snapshot_row(competitor, eta_date, fmt, path, rows=None):
+    written_at = datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+    return competitor, str(eta_date), fmt, str(path), rows, written_at
+
+def record_snapshot(competitor, eta_date, fmt, path, rows=None, manifest_path=None):
+    conn = connect(manifest_path)
+    try:
+        with conn:
+            conn.execute(UPSERT_SQL, snapshot_row(competitor, eta_date, fmt, path, rows))
+    finally:
+        conn.close()
+
+def rebuild_manifest(output_root=OUTPUT_ROOT, manifest_path=None):
+    conn = connect(manifest_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM snapshots")
+            conn.executemany(UPSERT_SQL, scan_output(output_root))
+        return conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+    finally:
+        conn.close()
+
+def _query(sql, params, manifest_path=None):
+    conn = connect(manifest_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+# newest snapshot of a competitor as a dict (competitor, eta_date, format, path, rows, written_at), None if there is none.
+# Without fmt the parquet file wins over the csv of the same eta_date.
+def latest_snapshot(competitor, fmt=None, manifest_path=None):
+    rows = _query(
+        "SELECT * FROM snapshots WHERE competitor = ? AND (? IS NULL OR format = ?) "
+        "ORDER BY eta_date DESC, format = 'parquet' DESC LIMIT 1",
+        (competitor, fmt, fmt), manifest_path,
+    )
+    return rows[0] if rows else None
+
+# every snapshot with start <= eta_date <= end, oldest first
+def snapshots_between(competitor, start, end, fmt=None, manifest_path=None):
+    return _query(
+        "SELECT * FROM snapshots WHERE competitor = ? AND eta_date BETWEEN ? AND ? AND (? IS NULL OR format = ?) "
+        "ORDER BY eta_date, format",
+        (competitor, str(start), str(end), fmt, fmt), manifest_path,
+    )
+
+# python -m modules.manifest --rebuild   (after moving files around in output/ by hand)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"📒 {rebuild_manifest()} snapshots in {MANIFEST_PATH}")
+    for competitor in ("mayesh", "flowermarketplace", "petaljet"):
+        print(competitor, latest_snapshot(competitor))
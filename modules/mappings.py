@@ -0,0 +1,99 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+# Lazily loaded mapping tables (mapping/*.csv -> dict). A table is only read on its first lookup, and the
+# dict built from the CSV is pickled to .cache/mappings together with the CSV's mtime, size and sha256.
+# Later runs unpickle it without touching pandas. A CSV with a new mtime but the same content (a fresh
+# checkout) is rehashed and keeps its compiled table; any change to the content recompiles it.
+CACHE_DIR = Path(os.getenv("MAPPING_CACHE_DIR", ".cache/mappings"))
+FORMAT_VERSION = 1 # bump when a build function changes what ends up in the compiled tables
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compiled_path(path, name):
+    return CACHE_DIR / f"{Path(path).stem}.{name}.pickle"
+
+def read_compiled(path, name):
+    try:
+        with open(compiled_path(path, name), "rb") as f:
+            compiled = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if compiled.get("version") != FORMAT_VERSION:
+        return None
+    return compiled
+
+def write_compiled(path, name, stat, sha256, table):
+    target = compiled_path(path, name)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump({
+            "version": FORMAT_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": sha256,
+            "table": table,
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, target)
+
+def load_compiled(path, name, build, read_csv_kwargs=None):
+    stat = os.stat(path)
+    compiled = read_compiled(path, name)
+    if compiled and compiled["mtime_ns"] == stat.st_mtime_ns and compiled["size"] == stat.st_size:
+        return compiled["table"]
+
+    sha256 = file_sha256(path)
+    if compiled and compiled["sha256"] == sha256:
+        table = compiled["table"]
+    else:
+        import pandas as pd # only needed when the CSV changed
+        table = build(pd.read_csv(path, **(read_csv_kwargs or {})))
+        print(f"📚 Compiled {len(table)} mappings from {path}")
+    try:
+        write_compiled(path, name, stat, sha256, table)
+    except OSError as e:
+        print(f"⚠️ Couldn't store compiled mapping for {path}: {e}")
+    return table
+
+# build function for the usual competitor id -> ibf key tables
+def column_mapping(key_column, value_column):
+    def build(df):
+        return dict(zip(df[key_column].astype(str), df[value_column]))
+    return build
+
+class LazyMapping:
+    def __init__(self, path, build, name="table", required=True, read_csv_kwargs=None):
+        self.path = path
+        self.build = build
+        self.name = name
+        self.read_csv_kwargs = read_csv_kwargs
+        self.required = required
+        self._table = None
+
+    def table(self):
+        if self._table is None:
+            try:
+                self._table = load_compiled(self.path, self.name, self.build, self.read_csv_kwargs)
+            except Exception as e:
+                if self.required:
+                    raise
+                print(f"Error loading mapping {self.path}: {e}")
+                self._table = {}
+        return self._table
+
+    def get(self, key, default=None):
+        return self.table().get(key, default)
+
+    def items(self):
+        return self.table().items()
+
+    def __len__(self):
+        return len(self.table())
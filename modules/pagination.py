@@ -0,0 +1,26 @@
+import asyncio
+
+# keeps `window` pages in flight and returns their results in page order,
+# stopping at the first page that comes back empty (pages after it are cancelled)
+async def fetch_pages_windowed(fetch, window=6, first_page=1):
+    in_flight = {}
+    next_page = first_page
+    results = []
+    page = first_page
+    try:
+        while True:
+            while len(in_flight) < window:
+                in_flight[next_page] = asyncio.create_task(fetch(next_page))
+                next_page += 1
+
+            products = await in_flight.pop(page)
+            if not products:
+                print(f"No products found on {page}")
+                break
+            results.append(products)
+            page += 1
+    finally:
+        for task in in_flight.values():
+            task.cancel()
+        await asyncio.gather(*in_flight.values(), return_exceptions=True)
+    return results
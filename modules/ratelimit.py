@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+import time
+import weakref
+import aiohttp
+import httpx
+
+# Adaptive per-host concurrency (AIMD). Every healthy response grows the host's limit by roughly one slot
+# per window of requests; a 429/5xx, a connection error or latency well above the host's baseline halves it.
+# Retry-After pauses the host. This replaces the hand-tuned semaphores and sleeps in the scrapers.
+# A request that got one of those responses is retried (RETRY_ATTEMPTS in total) once the host's pause is over,
+# so a scraper only ever sees the failure when the host keeps refusing.
+
+# (initial, maximum) concurrent requests per host
+HOST_LIMITS = {
+    "shop.dvflora.com": (20, 100),
+    "flowermarketplace.com": (4, 16),
+    "petaljet.com": (4, 16),
+    "www.mayesh.com": (2, 8),
+}
+DEFAULT_LIMITS = (4, 16)
+BACKOFF_STATUSES = {429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError, httpx.TransportError)
+RETRY_ATTEMPTS = 4
+RETRY_DELAY = 1.0 # seconds before the 2nd attempt, doubled for every further one (on top of any Retry-After pause)
+
+class AdaptiveLimiter:
+    def __init__(self, initial=4, maximum=16, minimum=1, decrease=0.5, latency_factor=3.0, cooldown=1.0):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown # one decrease per cooldown, a burst of errors from the same window counts once
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.ewma = None
+        self.baseline = None
+
+    async def acquire(self):
+        async with self.condition:
+            while self.in_flight >= int(self.limit):
+                await self.condition.wait()
+            self.in_flight += 1
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return time.monotonic()
+
+    async def release(self, started, status=None, failed=False, retry_after=None):
+        latency = time.monotonic() - started
+        if failed or status in BACKOFF_STATUSES:
+            self.backoff(retry_after)
+        elif self.is_slow(latency):
+            self.backoff()
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    # latency far above the host's usual response time is read as the server struggling
+    def is_slow(self, latency):
+        self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+        if self.baseline is None:
+            self.baseline = self.ewma
+        else:
+            # follows drops straight away and slow drifts upwards, so a permanently slower host isn't punished forever
+            self.baseline = min(self.ewma, self.baseline + (self.ewma - self.baseline) * 0.01)
+        return self.ewma > self.baseline * self.latency_factor
+
+    def backoff(self, retry_after=None):
+        now = time.monotonic()
+        if retry_after:
+            try:
+                self.paused_until = max(self.paused_until, now + float(retry_after))
+            except ValueError:
+                pass # HTTP-date form, the decrease below is enough
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+
+    # async with limiter.slot() as slot: ...; slot["status"] = response.status
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        started = await self.acquire()
+        outcome = {"status": None, "retry_after": None}
+        try:
+            yield outcome
+        except Exception as e:
+            status = getattr(e, "status", None)
+            retry_after = (getattr(e, "headers", None) or {}).get("Retry-After")
+            await self.release(started, status=status, failed=isinstance(e, TRANSIENT_ERRORS), retry_after=retry_after)
+            raise
+        except BaseException:
+            await self.release(started)
+            raise
+        else:
+            await self.release(started, status=outcome["status"], retry_after=outcome["retry_after"])
+
+def is_retryable(error):
+    return isinstance(error, TRANSIENT_ERRORS) or getattr(error, "status", None) in BACKOFF_STATUSES
+
+# runs `attempt(slot)` in one of the host's slots and again while it fails with a transient error or a backoff
+# status (raised, or set on the slot), up to RETRY_ATTEMPTS times; the last outcome is what the caller gets.
+# The next acquire waits out the pause a Retry-After put on the host.
+async def with_retries(host, attempt):
+    limiter = get_limiter(host)
+    for n in range(1, RETRY_ATTEMPTS + 1):
+        try:
+            async with limiter.slot() as slot:
+                result = await attempt(slot)
+        except Exception as e:
+            if n == RETRY_ATTEMPTS or not is_retryable(e):
+                raise
+            print(f"🔁 {host}: {type(e).__name__} {getattr(e, 'status', '') or e}, attempt {n + 1} of {RETRY_ATTEMPTS}")
+        else:
+            if n == RETRY_ATTEMPTS or slot["status"] not in BACKOFF_STATUSES:
+                return result
+            print(f"🔁 {host}: HTTP {slot['status']}, attempt {n + 1} of {RETRY_ATTEMPTS}")
+        await asyncio.sleep(RETRY_DELAY * 2 ** (n - 1))
+
+# one limiter per host and event loop, asyncio primitives can't be shared across loops
+limiters = weakref.WeakKeyDictionary()
+
+def get_limiter(host):
+    hosts = limiters.setdefault(asyncio.get_running_loop(), {})
+    if host not in hosts:
+        initial, maximum = HOST_LIMITS.get(host, DEFAULT_LIMITS)
+        hosts[host] = AdaptiveLimiter(initial=initial, maximum=maximum)
+    return hosts[host]
+
+# httpx transport that runs every request through its host's limiter
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport=None):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    # the body is read inside the slot, so the limit caps downloads and not just the wait for headers
+    async def handle_async_request(self, request):
+        async def attempt(slot):
+            response = await self.transport.handle_async_request(request)
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
+            slot["status"] = response.status_code
+            slot["retry_after"] = response.headers.get("Retry-After")
+            return response
+
+        return await with_retries(request.url.host, attempt)
+
+    async def aclose(self):
+        await self.transport.aclose()
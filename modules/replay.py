@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import json
+import os
+from pathlib import Path
+import aiohttp
+import httpx
+from multidict import CIMultiDict
+from modules.cache import DROP_HEADERS, cache_key, response_charset
+
+# Record/replay layer for the scrapers. With SCRAPE_MODE=record every response is written to REPLAY_DIR,
+# with SCRAPE_MODE=replay the same requests are answered from disk after REPLAY_LATENCY seconds,
+# so a full scrape can be rerun offline and timed. The HTTP cache is off in both modes. Only the response is
+# stored; request bodies (the Mayesh login) are part of the hashed key and never written out, but the login
+# response holds the JWT, so recordings are readable by the owner only.
+# Plug-in points: httpx_transport() for httpx.AsyncClient and replay_session() for aiohttp.ClientSession,
+# both wired in by modules/client.py.
+
+stats = {"requests": 0, "missing": 0}
+
+def replay_mode():
+    return os.getenv("SCRAPE_MODE", "").lower()
+
+def replay_dir():
+    return Path(os.getenv("REPLAY_DIR", ".replay"))
+
+def replay_latency():
+    return float(os.getenv("REPLAY_LATENCY", "0.05"))
+
+def recording_path(key):
+    return replay_dir() / key[:2] / f"{key}.json"
+
+def save_recording(key, method, url, status, headers, body):
+    path = recording_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    headers = {k.lower(): v for k, v in headers.items() if k.lower() not in DROP_HEADERS}
+    tmp_path = path.with_suffix(".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({
+            "method": method,
+            "url": str(url),
+            "status": status,
+            "headers": headers,
+            "body": base64.b64encode(body).decode("ascii"),
+        }, f)
+    os.replace(tmp_path, path)
+
+def load_recording(key):
+    stats["requests"] += 1
+    path = recording_path(key)
+    if not path.exists():
+        stats["missing"] += 1
+        return None
+    with open(path, encoding="utf-8") as f:
+        recording = json.load(f)
+    recording["body"] = base64.b64decode(recording["body"])
+    return recording
+
+def _body_bytes(body):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode()
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    return json.dumps(body).encode()
+
+# httpx
+class ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport=None):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        mode = replay_mode()
+        key = cache_key(request.method, request.url, await request.aread())
+        if mode == "replay":
+            await asyncio.sleep(replay_latency())
+            recording = load_recording(key)
+            if recording is None:
+                return httpx.Response(404, content=b"not recorded", request=request)
+            return httpx.Response(recording["status"], headers=recording["headers"], content=recording["body"], request=request)
+
+        response = await self.transport.handle_async_request(request)
+        if mode != "record":
+            return response
+        body = await response.aread()
+        save_recording(key, request.method, request.url, response.status_code, response.headers, body)
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in DROP_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+def httpx_transport(**kwargs):
+    transport = httpx.AsyncHTTPTransport(**kwargs)
+    if replay_mode() in ("record", "replay"):
+        return ReplayTransport(transport)
+    return transport
+
+# aiohttp
+class RecordedResponse:
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDict(headers)
+        self.body = body
+
+    async def read(self):
+        return self.body
+
+    async def text(self, encoding=None):
+        return self.body.decode(encoding or self.get_encoding(), errors="replace")
+
+    def get_encoding(self):
+        return response_charset(self.headers)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            error = aiohttp.ClientError(f"{self.status} for {self.url}")
+            error.status = self.status # read by the rate limiter, like ClientResponseError.status
+            raise error
+
+class _ReplayRequest:
+    def __init__(self, session, method, url, kwargs):
+        self.session = session
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+    async def __aenter__(self):
+        body = _body_bytes(self.kwargs.get("json", self.kwargs.get("data")))
+        key = cache_key(self.method, self.url, body)
+        if replay_mode() == "replay":
+            await asyncio.sleep(replay_latency())
+            recording = load_recording(key)
+            if recording is None:
+                return RecordedResponse(self.url, 404, {}, b"not recorded")
+            return RecordedResponse(self.url, recording["status"], recording["headers"], recording["body"])
+
+        async with self.session.request(self.method, self.url, **self.kwargs) as response:
+            body = await response.read()
+            headers = dict(response.headers)
+        save_recording(key, self.method, self.url, response.status, headers, body)
+        return RecordedResponse(self.url, response.status, headers, body)
+
+    async def __aexit__(self, *exc):
+        return False
+
+class ReplaySession:
+    def __init__(self, session):
+        self.session = session
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        return _ReplayRequest(self.session, method, url, kwargs)
+
+    async def close(self):
+        await self.session.close()
+
+    async def __aenter__(self):
+        await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self.session.__aexit__(*exc)
+
+def replay_session(session):
+    if replay_mode() in ("record", "replay"):
+        return ReplaySession(session)
+    return session
@@ -2,16 +2,19 @@ import asyncio
 import csv
 import re
 from pathlib import Path
-import aiohttp # faster compared to httpx
+from urllib.parse import urlsplit
 import aiosqlite # only in testin environment
 from selectolax.parser import HTMLParser
 from tqdm import tqdm # to show progress bar
+from modules.cache import aiohttp_get_text
+from modules.client import closing_clients, get_aiohttp_session
+from modules.ratelimit import HOST_LIMITS, with_retries
 
 URLS_CSV = Path("./utils/Mapping_products/dvflora_urls.csv")
 DB_PATH = Path("./utils/Mapping_products/dvflora.db") # while testing this is prevered and cleaner
-CONCURRENCY = 100 # the higher the faster, yet can be unstable
 BATCH_SIZE = 500 # used during testing to increase speed batch append to db
-sem = asyncio.Semaphore(CONCURRENCY) # limit the number of concurrent requests
+QUEUE_SIZE = BATCH_SIZE * 4 # parsed rows waiting for the writer, keeps memory flat
+WORKERS = HOST_LIMITS["shop.dvflora.com"][1] # the limiter's DVFlora cap, so its AIMD limit alone decides concurrency
 
 # used during testing to inspect results in a clean db
 CREATE_SQL = """
@@ -36,9 +39,39 @@ INSERT OR IGNORE INTO products
 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 """
 
+QTY_PRICE_RE = re.compile(r"(\d+)\s*@\s*\$?(\d+\.\d+)")
+PRICE_RE = re.compile(r"\$?(\d+\.\d+)")
+
+# same node as "#PageText > form:nth-of-type(2) > table > tbody", walked child by child instead of through the CSS engine
+def find_product_tbody(tree):
+    for page in tree.css("#PageText"):
+        forms = [node for node in page.iter() if node.tag == "form"]
+        if len(forms) < 2:
+            continue
+        for table in forms[1].iter():
+            if table.tag != "table":
+                continue
+            for tbody in table.iter():
+                if tbody.tag == "tbody":
+                    return tbody
+    return None
+
+# first visible price in the row, "qty @ $price" wins over a bare price within the same cell
+def parse_unit_price(texts):
+    for text in texts:
+        if "." not in text: # both patterns need a decimal point, skips the regex for most cells
+            continue
+        match = QTY_PRICE_RE.search(text)
+        if match:
+            return float(match.group(2))
+        match = PRICE_RE.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
 def extract_products(html: str, group: str, variety: str, color: str, url: str):
     tree = HTMLParser(html)
-    tbody = tree.css_first("#PageText > form:nth-of-type(2) > table > tbody")
+    tbody = find_product_tbody(tree)
     if not tbody:
         return []
 
@@ -50,58 +83,63 @@ def extract_products(html: str, group: str, variety: str, color: str, url: str):
         if len(cells) < 8:
             continue
 
-        item_number = cells[1].text(strip=True)
+        texts = [td.text(strip=True) for td in cells]
+        item_number = texts[1]
         if not item_number or item_number in seen:
             continue
         seen.add(item_number)
 
         name_node = cells[2].css_first("a")
         product_name = name_node.text(strip=True) if name_node else None
+        if not product_name:
+            continue
 
         origin_text = cells[2].text()
         origin = origin_text.split("Origin:")[-1].strip() if "Origin:" in origin_text else None
-        sold_as = cells[3].text(strip=True)
 
         stock_img = cells[4].css_first("img")
         in_stock = "yes" in stock_img.attrs.get("src", "").lower() if stock_img else False
 
-        # Search all cells for any visible price
-        unit_price = None
-        for td in cells:
-            text = td.text(strip=True)
-            match_qty_price = re.search(r"(\d+)\s*@\s*\$?(\d+\.\d+)", text)
-            match_price_only = re.search(r"\$?(\d+\.\d+)", text)
-            if match_qty_price:
-                unit_price = float(match_qty_price.group(2))
-                break
-            elif match_price_only:
-                unit_price = float(match_price_only.group(1))
-                break
-
-        if product_name and item_number:
-            products.append((
-                item_number, product_name, origin, sold_as, in_stock,
-                unit_price, group, variety, color, url
-            ))
+        products.append((
+            item_number, product_name, origin, texts[3], in_stock,
+            parse_unit_price(texts), group, variety, color, url
+        ))
 
     return products
 
 async def fetch_and_extract(session, row):
-    async with sem:
-        try:
-            async with session.get(row["url"], timeout=15) as response:
-                response.raise_for_status()
-                html = await response.text()
-                return extract_products(html, row["product_group"], row["variety"], row["color"], row["url"])
-        except Exception as e:
-            print(f"Error fetching {row['url']}: {e}")
-            return []
+    try:
+        # throttled and retried per host like the httpx scrapers (see modules/ratelimit.py)
+        html = await with_retries(urlsplit(row["url"]).hostname, lambda slot: aiohttp_get_text(session, row["url"]))
+        return extract_products(html, row["product_group"], row["variety"], row["color"], row["url"])
+    except Exception as e:
+        print(f"Error fetching {row['url']}: {e}")
+        return []
         
-async def insert_all_batches(conn, data, batch_size=BATCH_SIZE):
-    for i in range(0, len(data), batch_size):
-        batch = data[i:i+batch_size]
+# producer: pushes every parsed row of one URL onto the bounded queue, waits while the writer catches up
+async def fetch_into_queue(session, row, queue):
+    for product in await fetch_and_extract(session, row):
+        await queue.put(product)
+
+# single consumer: drains the queue into SQLite, one transaction per BATCH_SIZE rows
+async def write_batches(conn, queue, batch_size=BATCH_SIZE):
+    batch = []
+    total = 0
+    while True:
+        product = await queue.get()
+        if product is None:
+            break
+        batch.append(product)
+        if len(batch) >= batch_size:
+            await conn.executemany(INSERT_SQL, batch)
+            await conn.commit()
+            total += len(batch)
+            batch = []
+    if batch:
         await conn.executemany(INSERT_SQL, batch)
-    await conn.commit()
+        await conn.commit()
+        total += len(batch)
+    return total
 
 async def scrape_all():
     async with aiosqlite.connect(DB_PATH) as conn:
@@ -111,20 +149,31 @@ async def scrape_all():
         with open(URLS_CSV, newline="") as f:
             urls = list(csv.DictReader(f))
 
-        connector = aiohttp.TCPConnector(limit_per_host=CONCURRENCY)
-        async with aiohttp.ClientSession(
-            connector=connector,
-            headers={"User-Agent": "Mozilla/5.0"}
-        ) as session:
-            tasks = [fetch_and_extract(session, row) for row in urls]
-            all_results = []
-            for coro in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="⚡ Scraping"):
-                result = await coro
-                all_results.extend(result)
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        session = get_aiohttp_session()
+        rows = iter(urls)
+
+        with tqdm(total=len(urls), desc="⚡ Scraping") as progress:
+            # a worker only takes the next URL once the rows of its last one are queued,
+            # so at most WORKERS pages and QUEUE_SIZE rows are held at a time
+            async def worker():
+                for row in rows:
+                    await fetch_into_queue(session, row, queue)
+                    progress.update()
+
+            async def produce():
+                async with asyncio.TaskGroup() as workers:
+                    for _ in range(WORKERS):
+                        workers.create_task(worker())
+                await queue.put(None) # tells the writer the crawl is done
 
-        await insert_all_batches(conn, all_results)
+            # one task group: a failing writer cancels the crawl instead of leaving it blocked on a full queue
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce())
+                writer = group.create_task(write_batches(conn, queue))
+        total = writer.result()
 
-    print(f"\n✅ Scraped and inserted into {DB_PATH}: {len(all_results)} rows.")
+    print(f"\n✅ Scraped and inserted into {DB_PATH}: {total} rows.")
 
 if __name__ == "__main__":
-    asyncio.run(scrape_all())
\ No newline at end of file
+    asyncio.run(closing_clients(scrape_all()))
\ No newline at end of file
@@ -1,165 +1,210 @@
-import httpx
 import json
-import csv
 import sqlite3
 import os
 import re
 import asyncio
-import traceback
+import functools
+from collections import Counter
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
 import pandas as pd
 from datetime import datetime, date
 from modules.stealth import get_random_user_agent 
+from modules.pagination import fetch_pages_windowed
+from modules.client import closing_clients, get_client
+from modules.mappings import LazyMapping, column_mapping
+from modules.data import field, lookup, per_unique, truthy
+from modules.store import save_to_parquet
+from modules.manifest import record_snapshot
+from modules.history import append_snapshot
+from modules.diff import write_change_feed
 from modules.auth import authenticate
 from modules.scrape.mayesh import fetch_available_dates # used for earliest_eta
 from export.export_to_bq import upload_flowermarketplace_to_bigquery
 
 load_dotenv()
 
-try:
-    product_group_mapping = pd.read_csv('mapping/flowermarketplace_productgroups.csv', engine='python', on_bad_lines='skip')
-    product_group_dict = {}
-    for _, row in product_group_mapping.iterrows():
-        if pd.notnull(row['ibf_product_group']) and pd.notnull(row['competitor_product_group']):
-            key = str(row['ibf_product_group']).strip()
-            value = str(row['competitor_product_group']).strip()
-            if value.endswith(','): 
-                value = value[:-1]
-            product_group_dict[key] = value
-    print(f"Successfully loaded {len(product_group_dict)} product group mappings")
-except Exception as e:
-    print(f"Error loading product group mapping: {e}")
+# mapping/flowermarketplace_productgroups.csv: the ibf_product_group column holds the group names as they appear
+# on the site (the catslug), competitor_product_group the IBF product group key, so the dict is name -> key
+def build_product_group_dict(product_group_mapping):
+    product_group_mapping = product_group_mapping.dropna(subset=['ibf_product_group', 'competitor_product_group'])
     product_group_dict = {}
+    for name, key in zip(product_group_mapping['ibf_product_group'].astype(str), product_group_mapping['competitor_product_group'].astype(str)):
+        product_group_dict[name.strip()] = key.strip().removesuffix(',')
+    return product_group_dict
 
-try:
-    variety_mapping = pd.read_csv('mapping/flowermarketplace_varieties.csv')
-    variety_mapping_dict = dict(zip(variety_mapping['competitor_variety'].astype(str),
-                               variety_mapping['ibf_variety']))
-    print(f"Successfully loaded {len(variety_mapping_dict)} variety mappings")
-except Exception as e:
-    print(f"Error loading variety mapping: {e}")
-    variety_mapping_dict = {}
-
-def get_ibf_product_group_id(product_group_name):
-    # Try an exact match first
-    result = product_group_dict.get(str(product_group_name))
-    
-    # If no exact match, try a case-insensitive partial match
-    if not result or result == 'unmapped':
-        for key, value in product_group_dict.items():
-            if value != 'unmapped' and product_group_name.lower() in key.lower():
-                return value
-    
-    return result
+product_group_dict = LazyMapping('mapping/flowermarketplace_productgroups.csv', build_product_group_dict, required=False,
+                                 read_csv_kwargs={'engine': 'python', 'on_bad_lines': 'skip'})
+variety_mapping_dict = LazyMapping('mapping/flowermarketplace_varieties.csv', column_mapping('competitor_variety', 'ibf_variety'), required=False)
+
+def normalize_group_name(name):
+    return " ".join(str(name).replace("-", " ").lower().split())
+
+# Built once from product_group_dict: an exact table of normalized names plus every substring of every mapped name,
+# each pointing at the first mapped group (in CSV order) that contains it. That is the same answer the old
+# partial-match scan gave, but a lookup is a dict hit instead of a pass over the whole mapping.
+class ProductGroupIndex:
+    def __init__(self, mapping):
+        self.exact = {}
+        self.partial = {}
+        for name, key in mapping.items():
+            normalized = normalize_group_name(name)
+            self.exact.setdefault(normalized, key)
+            if key == 'unmapped':
+                continue
+            for start in range(len(normalized)):
+                for end in range(start + 1, len(normalized) + 1):
+                    self.partial.setdefault(normalized[start:end], key)
+        self.unmapped = Counter()
+
+    def resolve(self, name):
+        normalized = normalize_group_name(name)
+        result = self.exact.get(normalized)
+        if not result or result == 'unmapped':
+            result = self.partial.get(normalized, result)
+        return result
+
+@functools.lru_cache(maxsize=None)
+def get_product_group_index():
+    return ProductGroupIndex(product_group_dict.table())
+
+# catslugs repeat on every page, resolve each one once
+@functools.lru_cache(maxsize=None)
+def resolve_catslug(catslug):
+    group_name = catslug.replace('-', ' ').title()
+    return group_name, get_product_group_index().resolve(group_name)
+
+def report_unmapped_groups():
+    product_group_index = get_product_group_index()
+    if not product_group_index.unmapped:
+        return
+    print(f"⚠️ {len(product_group_index.unmapped)} product groups without a mapping:")
+    for group_name, count in product_group_index.unmapped.most_common():
+        print(f"   {group_name or '(empty catslug)'}: {count} products")
 
 def get_ibf_variety(variety_id):
     return variety_mapping_dict.get(str(variety_id))
 
+STEM_LENGTH_RE = r'(\d{2,3})\s?CM$' # "Rose Freedom 50 CM"
+STEM_SUFFIX_RE = r'\s?\d{2,3}\s?CM$'
+
+def parse_date_text(values):
+    parsed = pd.to_datetime(values, format='%m/%d/%Y', errors='coerce')
+    for raw_date in values[parsed.isna() & values.notna()]:
+        print(f"Invalid date: {raw_date}")
+    return parsed.dt.strftime('%Y-%m-%d').astype(object)
+
+def parse_landed_price(values):
+    prices = pd.Series(0, index=values.index, dtype=object)
+    mask = truthy(values)
+    prices[mask] = pd.to_numeric(values[mask], errors='coerce').astype(object)
+    return prices
+
+# catslug -> (group name, product group key), resolved once per distinct catslug
+def resolve_catslugs(catslugs):
+    codes, uniques = pd.factorize(catslugs.fillna(''), use_na_sentinel=False)
+    resolved = [resolve_catslug(catslug) for catslug in uniques]
+    group_names = pd.Series([name for name, _ in resolved], dtype=object).to_numpy()[codes]
+    group_keys = pd.Series([key for _, key in resolved], dtype=object).to_numpy()[codes]
+    return pd.Series(group_names, index=catslugs.index, dtype=object), pd.Series(group_keys, index=catslugs.index, dtype=object)
+
+# Normalizes every fetched product in one batch (runs in a worker thread): dates, stem lengths, prices and the
+# mapping lookups are column operations, the CSV gets the same columns and values the per-product loop produced.
+def normalize_products(products, eta_date):
+    today = date.today().strftime("%Y-%m-%d")
+
+    # the per-product loop skipped products with a null name (.strip() failed on them), drop them before any lookup
+    names = field(products, 'name', '').dropna()
+    if len(names) < len(products):
+        print(f"Skipped {len(products) - len(names)} products without a name")
+        products = [products[position] for position in names.index]
+    index = pd.RangeIndex(len(products))
+
+    names = names.reset_index(drop=True).astype(str).str.strip()
+    stem_length = names.str.extract(STEM_LENGTH_RE, flags=re.IGNORECASE, expand=False)
+    names = names.where(stem_length.isna(), names.str.replace(STEM_SUFFIX_RE, '', flags=re.IGNORECASE, regex=True).str.strip())
+
+    group_names, group_keys = resolve_catslugs(field(products, 'catslug'))
+    unmapped = group_keys.isna() | (group_keys == 'unmapped')
+    get_product_group_index().unmapped.update(group_names[unmapped].value_counts().to_dict())
+
+    landed_price = field(products, 'landed_price')
+    stem_price = per_unique(landed_price, parse_landed_price)
+    product_ids = field(products, 'id')
+    for product_id in product_ids[stem_price.isna()]:
+        print(f"Error processing product {product_id}: invalid landed_price")
+
+    normalized = pd.DataFrame({
+        'created_at': today,
+        'eta_date': per_unique(field(products, 'date_text'), parse_date_text).fillna(eta_date), # Use eta_date if the product has no valid date
+        'competitor_product_id': product_ids,
+        'competitor': 'Flowermarketplace',
+        'variety_key': per_unique(product_ids, lookup(variety_mapping_dict.table())),
+        'product_group_key': group_keys,
+        'competitor_product_name': names,
+        'stem_length': stem_length.astype('Int64'),
+        'stem_price': stem_price,
+        'competitor_product_group_name': group_names,
+        'grower_country': field(products, 'source'),
+        'unit': field(products, 'unit'),
+    }, index=index)
+    return normalized[stem_price.notna()]
+
 today = date.today().strftime("%Y-%m-%d")
+
+AJAX_URL = 'https://flowermarketplace.com/wp-admin/admin-ajax.php'
+HEADERS = {
+    "User-Agent": get_random_user_agent(),
+    "Referer": "https://flowermarketplace.com/",
+    "Origin": "https://flowermarketplace.com",
+    "Cache-Control": "no-cache",
+}
+PREFETCH_WINDOW = 16 # upper bound of wpf_product_listings pages in flight, the host's limiter decides how many actually run
+
+# a page that can't be fetched or parsed raises (the client's transport already retried it), only a valid
+# response without products ends the listing, so a failed page never passes for the last one
 async def process_page(client, page_number, product_key, eta_date):
-    try:
-        print(f"Processing page {page_number}...")
-        formatted_date = datetime.strptime(eta_date, '%Y-%m-%d').strftime('%m/%d/%Y')
-        url = f'https://flowermarketplace.com/wp-admin/admin-ajax.php?action=wpf_product_listings&model=landed&date_text={formatted_date}&page_no={page_number}' #formatted date is filled with ETA date from Mayesh 
-        
-        response = await client.get(url)
-        
-        # Check if the response is valid
-        if response.status_code != 200:
-            print(f"Error on page {page_number}: HTTP status {response.status_code}")
-            return False
-            
-        # Try to parse the JSON response
-        try:
-            data = response.json()
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON on page {page_number}: {e}")
-            return None
-            
-        # Check if the response is empty or has an unexpected structure
-        if not data:
-            print(f"Empty response on page {page_number}")
-            return None
-
-        # Access products based on the structure
-        products = []
-        if product_key and product_key in data:
-            products = data[product_key]
-        elif isinstance(data, list):
-            products = data
-        else:
-            # Try to find a list of products in the response
-            for key, value in data.items():
-                if isinstance(value, list) and len(value) > 0:
-                    products = value
-                    break
-        
-        if not products:
-            print(f"No products found on page {page_number}")
-            return None
-
-        page_products = []
-        product_count = 0
-
-        today = date.today().strftime("%Y-%m-%d")
-        for product in products:
-            try:
-                raw_date = product.get('date_text')
-                parsed_date = None
-                if raw_date:
-                    try:
-                        parsed_date = datetime.strptime(raw_date, '%m/%d/%Y').strftime('%Y-%m-%d')
-                    except ValueError:
-                        print(f"Invalid date: {raw_date}")
-
-                name = product.get('name', '').strip()
-                stem_length_match = re.search(r'(\d{2,3})\s?CM$', name.upper())
-
-                if stem_length_match:
-                    stem_length = int(stem_length_match.group(1))
-                    name = re.sub(r'\s?\d{2,3}\s?CM$', '', name, flags=re.IGNORECASE).strip()
-                else:
-                    stem_length = None
-
-                catslug_raw = product.get('catslug', '')
-                competitor_product_group_name = catslug_raw.replace('-', ' ').title()
-
-                product_data = {
-                    'created_at': today,
-                    'eta_date': parsed_date or eta_date,  # Use eta_date if parsed_date is None
-                    'competitor_product_id': product.get('id'),
-                    'competitor': 'Flowermarketplace',
-                    'variety_key': get_ibf_variety(str(product.get('id'))),
-                    'product_group_key': get_ibf_product_group_id(competitor_product_group_name),
-                    'competitor_product_name': name,
-                    'stem_length': stem_length,
-                    'stem_price': float(product.get('landed_price')) if product.get('landed_price') else 0,
-                    'competitor_product_group_name': competitor_product_group_name,
-                    'grower_country':product.get('source'),
-                    'unit': product.get('unit')
-                }
-                page_products.append(product_data)
-                product_count += 1
-                
-            except Exception as e:
-                print(f"Error processing product {product.get('id', 'unknown')}: {str(e)}")
-                traceback.print_exc()
-
-        print(f"Page {page_number} processed with {product_count} products.")
-        return page_products
-        
-    except Exception as e:
-        print(f"Error processing page {page_number}: {str(e)}")
-        traceback.print_exc()
+    print(f"Processing page {page_number}...")
+    formatted_date = datetime.strptime(eta_date, '%Y-%m-%d').strftime('%m/%d/%Y')
+    url = f'{AJAX_URL}?action=wpf_product_listings&model=landed&date_text={formatted_date}&page_no={page_number}' #formatted date is filled with ETA date from Mayesh 
+
+    response = await client.get(url, headers=HEADERS)
+    response.raise_for_status()
+    data = response.json()
+
+    # Check if the response is empty or has an unexpected structure
+    if not data:
+        print(f"Empty response on page {page_number}")
+        return None
+
+    # Access products based on the structure
+    products = []
+    if product_key and product_key in data:
+        products = data[product_key]
+    elif isinstance(data, list):
+        products = data
+    else:
+        # Try to find a list of products in the response
+        for key, value in data.items():
+            if isinstance(value, list) and len(value) > 0:
+                products = value
+                break
+
+    if not products:
+        print(f"No products found on page {page_number}")
         return None
 
-async def main():
+    print(f"Page {page_number} fetched with {len(products)} products.")
+    return products
+
+async def main(eta_date=None):
     # login using Mayesh Credentials to fetch the most recent ETA date used to construct the URL accordingly
-    email = os.getenv("EMAIL")
-    password = os.getenv("PASSWORD")
-    session, headers = authenticate(email, password)
-    eta_date = fetch_available_dates(session, headers) if session else None
+    # skipped when the orchestrator in main.py already resolved it
+    if not eta_date:
+        email = os.getenv("EMAIL")
+        password = os.getenv("PASSWORD")
+        mayesh_headers = await authenticate(email, password)
+        eta_date = await fetch_available_dates(get_client(), mayesh_headers) if mayesh_headers else None
 
     if not eta_date:
         print("Failed to fetch eta_date from Mayesh. Using today's date instead.")
@@ -170,82 +215,60 @@ async def main():
     # Set up database
     os.makedirs('output/flowermarketplace', exist_ok=True)
     
-    headers = {
-        "User-Agent": get_random_user_agent(),
-        "Referer": "https://flowermarketplace.com/",
-        "Origin": "https://flowermarketplace.com",
-        "Cache-Control": "no-cache",
-    }
-
-    # Add cookies if they're required for authentication
-    cookies = {}
-
     all_products = []
 
-    async with httpx.AsyncClient(headers=headers, cookies=cookies, follow_redirects=True, timeout=30) as client:
-        # First request to determine the structure
-        formatted_date = datetime.strptime(eta_date, '%Y-%m-%d').strftime('%m/%d/%Y')
-        response = await client.get(f'https://flowermarketplace.com/wp-admin/admin-ajax.php?action=wpf_product_listings&model=landed&date_text={formatted_date}&page_no=1')
-        
-        if response.status_code != 200:
-            print(f"Failed to access the first page: HTTP {response.status_code}")
-            return
-            
-        try:
-            data = response.json()
-        except json.JSONDecodeError:
-            print("Failed to parse the first page response as JSON")
-            return
-
-        # Determine the correct key for accessing product data
-        product_key = None
-        if isinstance(data, dict):
-            for key, value in data.items():
-                if isinstance(value, list) and len(value) > 0:
-                    product_key = key
-                    print(f"Found product key: {product_key}")
-                    break
+    client = get_client()
+    # First request to determine the structure
+    formatted_date = datetime.strptime(eta_date, '%Y-%m-%d').strftime('%m/%d/%Y')
+    response = await client.get(f'{AJAX_URL}?action=wpf_product_listings&model=landed&date_text={formatted_date}&page_no=1', headers=HEADERS)
+    
+    if response.status_code != 200:
+        print(f"Failed to access the first page: HTTP {response.status_code}")
+        return
         
+    try:
+        data = response.json()
+    except json.JSONDecodeError:
+        print("Failed to parse the first page response as JSON")
+        return
 
-        semaphore = asyncio.Semaphore(6)
-        
-        async def process_with_rate_limit(page):
-            async with semaphore:
-                result = await process_page(client, page, product_key, eta_date)
-                await asyncio.sleep(0.5)
-                return result
-        page = 1
-        while True:
-            products = await process_with_rate_limit(page)
-        
-            if not products:
-                print(f"No products found on {page}")
+    # Determine the correct key for accessing product data
+    product_key = None
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, list) and len(value) > 0:
+                product_key = key
+                print(f"Found product key: {product_key}")
                 break
-            all_products.extend(products)
-            page += 1
-
     
-    if all_products:
+
+    async def fetch(page):
+        return await process_page(client, page, product_key, eta_date)
+
+    for products in await fetch_pages_windowed(fetch, window=PREFETCH_WINDOW):
+        all_products.extend(products)
+    all_products = await asyncio.to_thread(normalize_products, all_products, eta_date)
+
+    if len(all_products):
         csv_file = f'output/flowermarketplace/flowermarketplace_inventory_{eta_date}.csv'
-        fieldnames = set()
-        for product in all_products:
-            fieldnames.update(product.keys())
-
-        with open(csv_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=sorted(fieldnames))
-            writer.writeheader()
-            writer.writerows(all_products)
+        # written off the event loop, the other scrapers run alongside
+        await asyncio.to_thread(all_products[sorted(all_products.columns)].to_csv, csv_file, index=False, lineterminator='\r\n')
+        await asyncio.to_thread(record_snapshot, 'flowermarketplace', eta_date, 'csv', csv_file, rows=len(all_products))
         print(f"Exported {len(all_products)} products to {csv_file}")
+        await asyncio.to_thread(save_to_parquet, all_products, 'flowermarketplace', eta_date)
+        await asyncio.to_thread(append_snapshot, 'flowermarketplace', eta_date)
+        await asyncio.to_thread(write_change_feed, 'flowermarketplace', eta_date)
     else:
         print("No products found")
 
+    report_unmapped_groups()
     print(f"processing complete for {eta_date}")
 
     try:
-        upload_flowermarketplace_to_bigquery()
+        await asyncio.to_thread(upload_flowermarketplace_to_bigquery)
         print("✅ Data successfully uploaded to BigQuery")
     except Exception as e:
         print(f"❌ Failed to upload data to BigQuery: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(closing_clients(main()))
\ No newline at end of file
@@ -1,10 +1,13 @@
-import requests
+import asyncio
+import math
+from modules.auth import post_authenticated
 
 DATES_URL = "https://www.mayesh.com/api/auth/dates"
 INVENTORY_URL = "https://www.mayesh.com/api/auth/inventory"
+PER_PAGE = 2000
 
-def fetch_available_dates(session, headers):
-    response  = session.post(DATES_URL, json={}, headers=headers)
+async def fetch_available_dates(client, headers):
+    response = await post_authenticated(client, DATES_URL, {}, headers)
 
     if response.status_code in [200, 201]:
         dates_data = response.json()
@@ -26,13 +29,12 @@ def fetch_available_dates(session, headers):
         print(f"something went wrong with fetching dates{response.status_code}")
         return None
 
-def fetch_inventory(session, headers, delivery_date):
-    print(f" Collecting inventory for {delivery_date}")
-    payload = {
+def inventory_payload(delivery_date, page_numb, per_page=PER_PAGE):
+    return {
         "filters": {
-            "perPage": 2000,
+            "perPage": per_page,
             "sortBy": "Name-ASC",
-            "pageNumb": 1,
+            "pageNumb": page_numb,
             "date": delivery_date,
             "is_sales_rep": 0,
             "is_e_sales": 0,
@@ -42,12 +44,72 @@ def fetch_inventory(session, headers, delivery_date):
         }
     }
 
-    response = session.post(INVENTORY_URL, json=payload, headers=headers)
+# the inventory endpoint isn't documented, so accept the usual pagination fields
+def get_page_count(data, per_page=PER_PAGE):
+    for key in ("last_page", "total_pages", "totalPages", "pages"):
+        if data.get(key):
+            return int(data[key])
+    for key in ("total", "total_count", "totalCount", "count"):
+        if data.get(key):
+            return math.ceil(int(data[key]) / per_page)
+    return None
+
+async def fetch_inventory_page(client, headers, delivery_date, page_numb, per_page=PER_PAGE):
+    response = await post_authenticated(client, INVENTORY_URL, inventory_payload(delivery_date, page_numb, per_page), headers)
     if response.status_code in [200, 201]:
-        data = response.json()
-        print(f"✅ fetched inventory for {delivery_date}, found {len(data.get('products', []))} products")
-        return data.get("products", [])
+        return response.json()
+    print(f"yikes couldn't fetch inventory page {page_numb} for {delivery_date}. status code: {response.status_code}")
+    return None
+
+# fetches every inventory page over one pooled client (throttled by its transport) and hands each page's products to `on_page`
+# as soon as it arrives, the raw response is dropped right after. A page that can't be fetched fails the whole inventory
+# (after the others finished, so the count is complete): a partial snapshot would read as mass delistings downstream.
+async def fetch_inventory_async(client, headers, delivery_date, on_page, per_page=PER_PAGE):
+    print(f" Collecting inventory for {delivery_date}")
+    first = await fetch_inventory_page(client, headers, delivery_date, 1, per_page)
+    if first is None:
+        raise RuntimeError(f"Mayesh inventory page 1 for {delivery_date} failed, no snapshot written")
+    products = first.get("products", [])
+    if not products:
+        return 0
+    page_count = get_page_count(first, per_page)
+    on_page(1, products)
+    total = len(products)
+    failed = []
+
+    if page_count is None:
+        # no page count in the response: keep walking until a short page comes back
+        page = 1
+        while len(products) == per_page:
+            page += 1
+            data = await fetch_inventory_page(client, headers, delivery_date, page, per_page)
+            if data is None:
+                failed.append(page)
+                break
+            products = data.get("products", [])
+            if products:
+                on_page(page, products)
+                total += len(products)
     else:
-        print(f"yikes couldn't fetch inventory for {delivery_date}. status code: {response.status_code}")
-        return []
-    
+        async def fetch(page):
+            nonlocal total
+            data = await fetch_inventory_page(client, headers, delivery_date, page, per_page)
+            if data is None:
+                failed.append(page)
+                return
+            products = data.get("products", [])
+            if products:
+                on_page(page, products)
+                total += len(products)
+
+        # a page that raises cancels the ones still in flight instead of leaving them running unawaited
+        async with asyncio.TaskGroup() as group:
+            for page in range(2, page_count + 1):
+                group.create_task(fetch(page))
+
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} Mayesh inventory page(s) for {delivery_date} failed ({', '.join(map(str, sorted(failed)))}), no snapshot written"
+        )
+    print(f"✅ fetched inventory for {delivery_date}, found {total} products")
+    return total
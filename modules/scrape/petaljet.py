@@ -3,12 +3,17 @@ import csv
 import json
 import re
 import datetime 
-import httpx
-from bs4 import BeautifulSoup
 import pandas as pd
 from dotenv import load_dotenv
 import os
 from modules.stealth import get_random_user_agent 
+from modules.pagination import fetch_pages_windowed
+from modules.client import closing_clients, get_client
+from modules.mappings import LazyMapping, column_mapping
+from modules.store import save_to_parquet
+from modules.manifest import record_snapshot
+from modules.history import append_snapshot
+from modules.diff import write_change_feed
 from modules.auth import authenticate
 from modules.scrape.mayesh import fetch_available_dates # used for earliest_eta
 from export.export_to_bq import upload_petaljet_to_bigquery # WIP
@@ -17,12 +22,8 @@ from export.export_to_bq import upload_petaljet_to_bigquery # WIP
 
 load_dotenv()
 
-PAGES = [
-    f"https://petaljet.com/collections/all-products?page={i}" for i in range(1, 16)
-]
-
-# make sure pages are loaded
-TIMEOUT = 15
+PAGE_URL = "https://petaljet.com/collections/all-products?page={}"
+PAGE_WINDOW = 8 # collection pages requested ahead while looking for the last one, throttled per host
 
 today = datetime.date.today().strftime("%Y-%m-%d")
 OUTPUT_FILE = f"output/petaljet/petaljet_inventory_{today}.csv"
@@ -41,29 +42,39 @@ COOKIES = {
     "_shopify_essential": shopify_cookie_value
 }
 
-async def fetch_page(client, url):
-    try:
-        resp = await client.get(url,headers=HEADERS, timeout=TIMEOUT)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        for script in soup.find_all("script"):
-            if script.string and '"products":[' in script.string:
-                match = re.search(r"var meta = (\{.*?\});", script.string, re.DOTALL)
-                if match:
-                    return json.loads(match.group(1))["products"]
-    except Exception as e:
-        print(f"\u26a0 Error on {url}: {e}")
+META_MARKER = "var meta = "
+meta_decoder = json.JSONDecoder()
+
+# scans the raw page for the Shopify `var meta = {...}` payload and decodes it in place,
+# no DOM is built and the decoder stops at the closing brace of the object
+def extract_meta_products(html):
+    start = html.find(META_MARKER)
+    while start != -1:
+        try:
+            meta, _ = meta_decoder.raw_decode(html, start + len(META_MARKER))
+        except ValueError:
+            meta = None
+        if isinstance(meta, dict) and "products" in meta:
+            return meta["products"]
+        start = html.find(META_MARKER, start + len(META_MARKER))
     return []
 
-product_group_mapping = pd.read_csv("Mapping/petaljet_productgroups.csv")
-mapping_dict = dict(zip(product_group_mapping['competitor_product_group'].astype(str), 
-                       product_group_mapping['ibf_product_group']))
+# only a 200 page carrying the meta payload with an empty product list is the end of the collection; errors
+# (already retried by the client's transport) and pages without the payload raise, so the scrape fails instead of
+# being cut short at that page
+async def fetch_page(client, url):
+    resp = await client.get(url, headers=HEADERS)
+    resp.raise_for_status()
+    if META_MARKER not in resp.text:
+        raise ValueError(f"no product meta on {url}")
+    return extract_meta_products(resp.text)
+
+mapping_dict = LazyMapping("mapping/petaljet_productgroups.csv", column_mapping('competitor_product_group', 'ibf_product_group'))
  
 def get_ibf_product_group(product_type):
     return mapping_dict.get(str(product_type))
 
-variety_mapping = pd.read_csv("Mapping/petaljet_varieties.csv")
-variety_mapping_dict = dict(zip(variety_mapping['competitor_variety'].astype(str),
-                                 variety_mapping['ibf_variety']))
+variety_mapping_dict = LazyMapping("mapping/petaljet_varieties.csv", column_mapping('competitor_variety', 'ibf_variety'))
 
 def get_ibf_variety(variety_name):
     return variety_mapping_dict.get(str(variety_name))
@@ -105,11 +116,13 @@ def extract_variant_data(product, eta_date):
         })
     return variants
 
-async def main():
-    email = os.getenv("EMAIL")
-    password = os.getenv("PASSWORD")
-    session, headers = authenticate(email, password)
-    eta_date = fetch_available_dates(session, headers) if session else None
+async def main(eta_date=None):
+    # skipped when the orchestrator in main.py already resolved the ETA date
+    if not eta_date:
+        email = os.getenv("EMAIL")
+        password = os.getenv("PASSWORD")
+        mayesh_headers = await authenticate(email, password)
+        eta_date = await fetch_available_dates(get_client(), mayesh_headers) if mayesh_headers else None
 
     if not eta_date:
         print("Failed to fetch eta_date from Mayesh. Exiting.")
@@ -117,12 +130,16 @@ async def main():
     
     print(f"Using eta_date from Mayesh: {eta_date}")
     all_items = []
-    async with httpx.AsyncClient(headers=HEADERS, cookies=COOKIES, follow_redirects=True) as client:
-        tasks = [fetch_page(client, url) for url in PAGES]
-        results = await asyncio.gather(*tasks)
-        for product_list in results:
-            for product in product_list:
-                all_items.extend(extract_variant_data(product, eta_date))
+    client = get_client()
+    for name, value in COOKIES.items():
+        if value:
+            client.cookies.set(name, value, domain="petaljet.com")
+
+    # walk the collection until the first empty page instead of guessing the page count
+    results = await fetch_pages_windowed(lambda page: fetch_page(client, PAGE_URL.format(page)), window=PAGE_WINDOW)
+    for product_list in results:
+        for product in product_list:
+            all_items.extend(extract_variant_data(product, eta_date))
 
     df = pd.DataFrame(all_items)
     grouped = df.groupby(["competitor_product_name", "stem_length"])["stems_per_unit"]
@@ -130,14 +147,18 @@ async def main():
     df.sort_values(by=["competitor_product_name", "stem_length", "stems_per_unit"], inplace=True)
 
     output_file = f"output/petaljet/petaljet_inventory_{eta_date}.csv"
-    df.to_csv(output_file, index=False)
+    await asyncio.to_thread(df.to_csv, output_file, index=False)
+    await asyncio.to_thread(record_snapshot, "petaljet", eta_date, "csv", output_file, rows=len(df))
     print(f"✅ Scraped {len(df)} product variants to {output_file}")
+    await asyncio.to_thread(save_to_parquet, df, "petaljet", eta_date)
+    await asyncio.to_thread(append_snapshot, "petaljet", eta_date)
+    await asyncio.to_thread(write_change_feed, "petaljet", eta_date)
 
     try:
-        upload_petaljet_to_bigquery()
+        await asyncio.to_thread(upload_petaljet_to_bigquery)
         print("✅ Data successfully uploaded to BigQuery")
     except Exception as e:
         print(f"❌ Failed to upload data to BigQuery: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(closing_clients(main()))
\ No newline at end of file
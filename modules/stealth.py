@@ -1,4 +1,4 @@
-import time
+import asyncio
 import random
 
 USER_AGENTS = [
@@ -8,10 +8,11 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/51.0.5767.1821 Safari/537.36"
 ]
 
-def random_delay(min_seconds=1, max_seconds=5):
+# awaited, so the other scrapers keep running while this one waits
+async def random_delay(min_seconds=1, max_seconds=5):
     delay = random.randint(min_seconds, max_seconds)
     print(f"🛌Sleeping for {delay} seconds")
-    time.sleep(delay)
+    await asyncio.sleep(delay)
 
 def get_random_user_agent():
     return random.choice(USER_AGENTS)
\ No newline at end of file
@@ -1,17 +1,149 @@
 import os
 import csv
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from modules.manifest import latest_snapshot, record_snapshot
 
-def save_to_csv(data, filename, subdir="mayesh", output_root="output"):
-    if not data:
+# data is a list of dicts or a DataFrame, both are written the same way (csv module dialect, \r\n line endings).
+# With competitor and eta_date the file is registered in the snapshot manifest (modules/manifest.py).
+def save_to_csv(data, filename, subdir="mayesh", output_root="output", competitor=None, eta_date=None):
+    if data is None or len(data) == 0:
         raise ValueError("no data to save")
 
     output_dir = os.path.join(output_root, subdir)
     os.makedirs(output_dir, exist_ok=True)
     file_path = os.path.join(output_dir, filename)
+    tmp_path = os.path.join(output_dir, f".{filename}.tmp")
 
-    with open(file_path, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=data[0].keys())
-        writer.writeheader()
-        writer.writerows(data)
+    if hasattr(data, "to_csv"):
+        data.to_csv(tmp_path, index=False, encoding='utf-8', lineterminator='\r\n')
+    else:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=data[0].keys())
+            writer.writeheader()
+            writer.writerows(data)
+    os.replace(tmp_path, file_path)
+    if competitor and eta_date:
+        record_snapshot(competitor, eta_date, "csv", file_path, rows=len(data))
     print(f"saved {filename}")
-    return file_path
\ No newline at end of file
+    return file_path
+
+# Typed snapshots: one zstd Parquet file per competitor and eta_date,
+# output/parquet/<competitor>/<eta_date>.parquet, with the column types fixed per competitor
+PARQUET_ROOT = "output/parquet"
+PARQUET_COMPRESSION = "zstd"
+# nullable integer columns come back as Int32/Int64 instead of float64
+PANDAS_TYPES = {pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype()}
+
+SCHEMAS = {
+    "mayesh": pa.schema([
+        ("created_at", pa.date32()),
+        ("eta_date", pa.date32()),
+        ("state", pa.string()),
+        ("competitor", pa.string()),
+        ("grower_name", pa.string()),
+        ("grower_country", pa.string()),
+        ("competitor_product_id", pa.int64()),
+        ("competitor_product_name", pa.string()),
+        ("competitor_product_group_name", pa.string()),
+        ("competitor_product_group_id", pa.int64()),
+        ("product_group_key", pa.string()),
+        ("variety_key", pa.string()),
+        ("stem_length", pa.int32()),
+        ("color_name", pa.string()),
+        ("competitor_product_url", pa.string()),
+        ("competitor_product_image", pa.string()),
+        ("available_units", pa.int64()),
+        ("stems_per_unit", pa.int64()),
+        ("stem_price", pa.float64()),
+        ("unit_price", pa.float64()),
+        ("base_price", pa.float64()),
+        ("freight_price", pa.float64()),
+        ("margin", pa.float64()),
+        ("competitor_highlight_name", pa.string()),
+    ]),
+    "flowermarketplace": pa.schema([
+        ("competitor", pa.string()),
+        ("competitor_product_group_name", pa.string()),
+        ("competitor_product_id", pa.int64()),
+        ("competitor_product_name", pa.string()),
+        ("created_at", pa.date32()),
+        ("eta_date", pa.date32()),
+        ("grower_country", pa.string()),
+        ("product_group_key", pa.string()),
+        ("stem_length", pa.int32()),
+        ("stem_price", pa.float64()),
+        ("unit", pa.string()),
+        ("variety_key", pa.string()),
+    ]),
+    "petaljet": pa.schema([
+        ("created_at", pa.date32()),
+        ("eta_date", pa.date32()),
+        ("competitor_product_id", pa.int64()),
+        ("competitor", pa.string()),
+        ("competitor_variant_id", pa.int64()),
+        ("product_group_key", pa.string()),
+        ("variety_key", pa.string()),
+        ("competitor_product_group_name", pa.string()),
+        ("competitor_product_name", pa.string()),
+        ("stem_length", pa.int32()),
+        ("stems_per_unit", pa.int32()),
+        ("unit_price", pa.float64()),
+        ("stem_price", pa.float64()),
+        ("min_stems_each", pa.int32()),
+        ("max_stems_each", pa.int32()),
+    ]),
+}
+
+# casts one column to its schema type; values that don't fit ("" stem lengths and the like) become nulls
+def typed_column(values, arrow_type):
+    if pa.types.is_date(arrow_type):
+        values = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce").dt.date
+    elif pa.types.is_integer(arrow_type):
+        values = pd.to_numeric(values, errors="coerce").astype("Int64")
+    elif pa.types.is_floating(arrow_type):
+        values = pd.to_numeric(values, errors="coerce").astype("float64")
+    else:
+        values = values.where(values.isna(), values.astype(str)).astype(object)
+    return pa.array(values, type=arrow_type, from_pandas=True)
+
+def typed_table(data, competitor):
+    schema = SCHEMAS[competitor]
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    extra = [column for column in df.columns if column not in schema.names]
+    if extra:
+        print(f"⚠️ {competitor}: columns {extra} aren't in the schema and are not stored")
+    columns = [
+        typed_column(df[field.name], field.type) if field.name in df else pa.nulls(len(df), type=field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def parquet_path(competitor, eta_date, output_root=PARQUET_ROOT):
+    return Path(output_root) / competitor / f"{eta_date}.parquet"
+
+# writes next to the target and renames, a crashed run never leaves a half written snapshot behind
+def save_to_parquet(data, competitor, eta_date, output_root=PARQUET_ROOT, record=True):
+    if data is None or len(data) == 0:
+        raise ValueError("no data to save")
+
+    file_path = parquet_path(competitor, eta_date, output_root)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(f".{file_path.name}.tmp")
+    pq.write_table(typed_table(data, competitor), tmp_path, compression=PARQUET_COMPRESSION)
+    os.replace(tmp_path, file_path)
+    if record:
+        record_snapshot(competitor, eta_date, "parquet", file_path, rows=len(data))
+    print(f"saved {file_path}")
+    return str(file_path)
+
+# reads one snapshot (the latest one in the manifest without eta_date), only the requested columns are decoded
+def read_parquet(competitor, eta_date=None, columns=None, output_root=PARQUET_ROOT):
+    if eta_date is None:
+        latest = latest_snapshot(competitor, fmt="parquet")
+        if latest is None:
+            raise FileNotFoundError(f"no {competitor} parquet snapshots in the manifest")
+        eta_date = latest["eta_date"]
+    return pq.read_table(parquet_path(competitor, eta_date, output_root), columns=columns).to_pandas(types_mapper=PANDAS_TYPES.get)
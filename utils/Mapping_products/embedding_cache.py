@@ -0,0 +1,79 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+import numpy as np
+
+# On-disk embedding store shared by the *_mapping.py scripts: one directory per model with a float32 matrix
+# (vectors.f32, memory-mapped) and index.json holding the text hash of every row. Reruns only encode names
+# that aren't in there yet and the IBF catalog is encoded once for all competitors. The model itself is only
+# loaded when something has to be encoded.
+# Texts are keyed (and encoded) lower case with collapsed whitespace, bge-base-en-v1.5 is uncased anyway.
+CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE", Path(__file__).resolve().parents[2] / ".cache" / "embeddings"))
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    def __init__(self, model_name, model=None, cache_dir=CACHE_DIR):
+        self.model_name = model_name
+        self._model = model
+        self.directory = Path(cache_dir) / re.sub(r"[^A-Za-z0-9._-]", "__", model_name)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.index_path = self.directory / "index.json"
+        self.lock_path = self.directory / ".lock"
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def read_index(self):
+        if not self.index_path.exists():
+            return None, {}
+        with open(self.index_path, encoding="utf-8") as file:
+            index = json.load(file)
+        return index["dim"], {key: row for row, key in enumerate(index["keys"])}
+
+    # appends after the rows the index knows about (whatever a run that died between the two writes left there is
+    # overwritten), then swaps in the new index
+    def write(self, rows, new_keys, vectors, dim):
+        keys = sorted(rows, key=rows.get) + list(new_keys)
+        with open(self.vectors_path, "ab") as file:
+            file.truncate(len(rows) * dim * 4)
+            file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        tmp_path = self.index_path.with_name(f".{self.index_path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"model": self.model_name, "dim": dim, "keys": keys}, file)
+        os.replace(tmp_path, self.index_path)
+
+    # embeddings for `texts` in order as a (len(texts), dim) float32 array, encoding only the ones not cached yet
+    def encode(self, texts, **encode_kwargs):
+        texts = [normalize_text(text) for text in texts]
+        keys = [text_key(text) for text in texts]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "w") as lock: # two mapping scripts at once append one after the other
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dim, rows = self.read_index()
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in rows and key not in missing:
+                    missing[key] = text
+            if missing:
+                print(f"🧮 encoding {len(missing)} of {len(set(keys))} names with {self.model_name}")
+                vectors = self.model.encode(list(missing.values()), convert_to_numpy=True, **encode_kwargs)
+                dim = vectors.shape[1]
+                self.write(rows, missing, vectors, dim)
+                for key in missing:
+                    rows[key] = len(rows)
+        if not keys:
+            return np.zeros((0, dim or 0), dtype=np.float32)
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(rows), dim))
+        return np.asarray(matrix[[rows[key] for key in keys]])
@@ -0,0 +1,92 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Name matcher shared by the *_mapping.py scripts: cosine similarities as chunked matrix products (no per-name
+# loop), the assorted-color penalty as a mask over the whole catalog and the one-competitor-name-per-IBF-id rule
+# in a single pass. Gives the same matches, in the same order, as the per-name loops it replaces.
+ASSORTED_PENALTY = 0.05
+REPLACE_MARGIN = 0.05 # a later match only takes an IBF id over when it scores this much higher
+SPECIFIC_COLORS = [
+    "red", "blue", "yellow", "green", "white", "pink", "purple", "orange",
+    "peach", "lavender", "coral", "burgundy", "cream", "gold", "silver",
+]
+CHUNK_SIZE = 1024 # query rows per matrix product, bounds memory at CHUNK_SIZE x len(catalog) floats
+
+def normalized(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-8)
+
+# the k most similar catalog rows for every query row, best first: (indices, scores), both (len(query), k).
+# k=1 is a plain argmax so ties go to the first catalog row, like torch's argmax did.
+def top_k(query, catalog, k=1, chunk_size=CHUNK_SIZE):
+    query, catalog = normalized(query), normalized(catalog)
+    indices = np.empty((len(query), k), dtype=np.int64)
+    scores = np.empty((len(query), k), dtype=np.float32)
+    for start in range(0, len(query), chunk_size):
+        similarities = query[start:start + chunk_size] @ catalog.T
+        if k == 1:
+            best = similarities.argmax(axis=1)[:, None]
+        else:
+            best = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(similarities, best, axis=1), axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+        indices[start:start + chunk_size] = best
+        scores[start:start + chunk_size] = np.take_along_axis(similarities, best, axis=1)
+    return indices, scores
+
+# catalog names with a single color in them (and not assorted themselves)
+def single_color(names):
+    names = pd.Series(names, dtype=object).astype(str).str.lower()
+    colors = "|".join(re.escape(color) for color in SPECIFIC_COLORS)
+    return (names.str.contains(colors, regex=True) & ~names.str.contains("assorted", regex=False)).to_numpy()
+
+def assorted(names):
+    return pd.Series(names, dtype=object).astype(str).str.lower().str.contains("assorted", regex=False).to_numpy()
+
+# best catalog match per query name above the threshold: (query index, catalog index, score rounded to 3), sorted by
+# score, high to low (ties keep the query order)
+def candidate_matches(query_names, catalog_names, query_embeddings, catalog_embeddings, threshold, penalize_assorted=True):
+    indices, scores = top_k(query_embeddings, catalog_embeddings, k=1)
+    best, scores = indices[:, 0], scores[:, 0].astype(np.float64)
+    if penalize_assorted:
+        scores = scores - ASSORTED_PENALTY * (assorted(query_names) & single_color(catalog_names)[best])
+    keep = np.flatnonzero(scores >= threshold)
+    rounded = np.array([round(score, 3) for score in scores[keep].tolist()], dtype=np.float64)
+    order = np.argsort(-rounded, kind="stable")
+    return list(zip(keep[order].tolist(), best[keep][order].tolist(), rounded[order].tolist()))
+
+# one competitor name per IBF id: the first (best) name keeps it, other products with that same name join it,
+# a later name only takes it over when it scores REPLACE_MARGIN higher. Matches are kept in one list per IBF id and
+# put back in candidate order at the end, instead of filtering the whole result on every takeover.
+def resolve_conflicts(candidates, query_names, catalog_ids):
+    owners = {}
+    kept = {}
+    for position, (query_index, catalog_index, score) in enumerate(candidates):
+        ibf_id = catalog_ids[catalog_index]
+        name = query_names[query_index]
+        owner = owners.get(ibf_id)
+        if owner is None:
+            owners[ibf_id] = (name, score)
+            kept[ibf_id] = [position]
+        elif owner[0] == name:
+            kept[ibf_id].append(position)
+        elif score > owner[1] + REPLACE_MARGIN:
+            owners[ibf_id] = (name, score)
+            kept[ibf_id] = [position]
+    return [candidates[position] for position in sorted(position for positions in kept.values() for position in positions)]
+
+# the whole two-pass match of the mapping scripts as a DataFrame in their column layout, `prefix` names the competitor
+def match_products(query_df, query_names, query_embeddings, ibf_df, ibf_names, ibf_embeddings,
+                   prefix, id_column, threshold=0.8):
+    candidates = candidate_matches(query_names, ibf_names, query_embeddings, ibf_embeddings, threshold)
+    matches = resolve_conflicts(candidates, query_names, ibf_df["variety_key"].tolist())
+    query_index = [match[0] for match in matches]
+    ibf_index = [match[1] for match in matches]
+    return pd.DataFrame({
+        f"{prefix}_product_id": query_df[id_column].to_numpy()[query_index],
+        f"{prefix}_product_name": [query_names[index] for index in query_index],
+        "ibf_product_id": ibf_df["variety_key"].to_numpy()[ibf_index],
+        "ibf_product_name": [ibf_names[index] for index in ibf_index],
+        "similarity_score": [match[2] for match in matches],
+    })
@@ -8,11 +8,11 @@ therefore we create links and finetune it to variety and color so that we stay i
 
 import csv
 import asyncio 
-import httpx
 from selectolax.parser import HTMLParser
 from pathlib import Path
 from urllib.parse import urlencode, urlparse, parse_qs
 from tqdm import tqdm
+from modules.client import closing_clients, get_client # run from the repo root: python -m utils.Mapping_products.url_collector_dvflora
 
 BASE_URL = "https://shop.dvflora.com/cgi-bin/dv.sh/nfprod-list.w"
 COMMON_PARAMS = {
@@ -34,6 +34,7 @@ OUTPUT_CSV = "./utils/Mapping_products/dvflora_urls.csv"
 
 
 # fetch raw HTML content of a  url using httpx.AsyncClient and return it as a string.
+# concurrency is set by the client's per-host rate limiter
 async def fetch_html(client, url):
     try:
         resp = await client.get(url)
@@ -68,7 +69,7 @@ def parse_varieties(html):
             variety = option.text(strip=True)
         if variety and variety.lower() != "all":
             values.append(variety)
-    return list(set(values))
+    return sorted(set(values)) # sorted so dvflora_urls.csv comes out in the same order every run
 
 # extract colors from a toggle select element
 async def extract_colors(client, webcatkey, variety):
@@ -89,45 +90,56 @@ async def extract_colors(client, webcatkey, variety):
             color = option.text(strip=True)
         if color and color.lower() != "all":
             values.append(color)
-    return list(set(values))
-
+    return sorted(set(values))
+
+
+# collects every variety x color url of one product group, colors of all varieties are fetched concurrently
+async def collect_category(client, group_name, webcatkey):
+    variety_url = f"{BASE_URL}?WebCatKey={webcatkey}"
+    html = await fetch_html(client, variety_url)
+    varieties = parse_varieties(html)
+
+    # if no varieties are found, skip this product group
+    variety_colors = await asyncio.gather(*(extract_colors(client, webcatkey, variety) for variety in varieties))
+
+    urls = []
+    for variety, colors in zip(varieties, variety_colors):
+        if not colors:
+            colors = ["all"]
+
+        # construct URLs for each combination of product group, webcatkey, variety, and color
+        for color in colors:
+            params = COMMON_PARAMS.copy()
+            params.update({
+                "WebCatKey": webcatkey,
+                "Variety": variety,
+                "Color": color,
+            })
+            # Construct the full URL with query parameters
+            full_url = f"{BASE_URL}?{urlencode(params)}"
+            urls.append((group_name, webcatkey, variety, color, full_url))
+    return urls
 
 # main function to collect URLs from the input CSV file
 async def collect_urls():
-    tasks = []
-
-    async with httpx.AsyncClient() as client:
-        with open(INPUT_CSV, newline="") as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            rows = [row for row in reader if len(row) >= 2]
-
-
-
-            # goes through rows in the CSV file and construct URLs for each product group
-            for row in tqdm(rows, desc="Collecting URLs", unit="productgroup"):
-                group_name, webcatkey = row[0].strip(), row[1].strip()
-                variety_url = f"{BASE_URL}?WebCatKey={webcatkey}"
-                html = await fetch_html(client, variety_url)
-                varieties = parse_varieties(html)
-
-                # if no varieties are found, skip this product group
-                for variety in varieties:
-                    colors = await extract_colors(client, webcatkey, variety)
-                    if not colors:
-                        colors = ["all"]
-
-                    # construct URLs for each combination of product group, webcatkey, variety, and color
-                    for color in colors:
-                        params = COMMON_PARAMS.copy()
-                        params.update({
-                            "WebCatKey": webcatkey,
-                            "Variety": variety,
-                            "Color": color,
-                        })
-                        # Construct the full URL with query parameters
-                        full_url = f"{BASE_URL}?{urlencode(params)}"
-                        tasks.append((group_name, webcatkey, variety, color, full_url))
+    with open(INPUT_CSV, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [row for row in reader if len(row) >= 2]
+
+    client = get_client()
+
+    async def collect(index, row):
+        return index, await collect_category(client, row[0].strip(), row[1].strip())
+
+    # categories finish in any order, results are put back in csv order afterwards
+    results = [None] * len(rows)
+    jobs = [collect(index, row) for index, row in enumerate(rows)]
+    for coro in tqdm(asyncio.as_completed(jobs), total=len(jobs), desc="Collecting URLs", unit="productgroup"):
+        index, urls = await coro
+        results[index] = urls
+
+    tasks = [url for urls in results for url in urls]
 
     # write the collected URLs to a CSV file
     with open(OUTPUT_CSV, "w", newline="") as f:
@@ -137,6 +149,6 @@ async def collect_urls():
     print(f"✅ Collected {len(tasks)} URLs and saved to {OUTPUT_CSV}")
 
 if __name__ == "__main__":
-    asyncio.run(collect_urls())
+    asyncio.run(closing_clients(collect_urls()))
 
 